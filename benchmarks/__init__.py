@@ -0,0 +1,3 @@
+"""
+Throughput benchmarks for the tap, run against the local mock API
+"""
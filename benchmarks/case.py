@@ -0,0 +1,113 @@
+"""
+Runs one benchmark sync in its own process: `tap_abcfinancial.main` with the
+decode, transform and stdout paths timed, and the measurements written as JSON.
+
+    python -m benchmarks.case METRICS_PATH PAGE_SIZE -- TAP ARGS...
+"""
+import json
+import resource
+import sys
+import threading
+import time
+
+
+class Timings:
+    """
+    Seconds spent in each instrumented phase of the sync, across all threads.
+    Phases are timed exclusively: time spent in a phase nested in another only
+    counts towards the inner one.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.records = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def wrap(self, name, func):
+        self.seconds.setdefault(name, 0.0)
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            stack = self.local.__dict__.setdefault('stack', [])
+            # seconds spent in nested phases
+            stack.append(0.0)
+            started = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self.lock:
+                    self.seconds[name] += elapsed - nested
+
+        return timed
+
+
+def instrument(timings, page_size):
+    """
+    Patches the tap's modules so that each phase is timed
+    """
+    from tap_abcfinancial import executor, output, pages, streams
+
+    # the mock API may serve smaller pages than the real one, which the tap
+    # would otherwise take for the last page of each range
+    executor.PAGE_SIZE = page_size
+
+    pages.loads = timings.wrap('decode', pages.loads)
+
+    stream_transform = streams.stream_transform
+
+    def timed_stream_transform(catalog_entry):
+        return timings.wrap('transform', stream_transform(catalog_entry))
+
+    streams.stream_transform = timed_stream_transform
+
+    write_records = output.RecordWriter.write_records
+
+    def counted_write_records(self, stream, records):
+        count = write_records(self, stream, records)
+        timings.records += count
+        return count
+
+    # what is left once the transform and stdout writes are taken out is
+    # mostly building and serializing RECORD messages
+    output.RecordWriter.write_records = timings.wrap('serialize',
+                                                     counted_write_records)
+    output.RecordWriter.flush = timings.wrap('stdout', output.RecordWriter.flush)
+
+
+def main():
+    metrics_path, page_size = sys.argv[1], int(sys.argv[2])
+    tap_args = sys.argv[sys.argv.index('--') + 1:]
+
+    timings = Timings()
+    instrument(timings, page_size)
+
+    from tap_abcfinancial import main as tap_main
+
+    sys.argv = ['tap-abcfinancial'] + tap_args
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        tap_main()
+    finally:
+        sys.stdout.flush()
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+
+        with open(metrics_path, 'w') as metrics:
+            json.dump({
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'records': timings.records,
+                # kilobytes on Linux
+                'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                'phase_seconds': timings.seconds,
+            }, metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+End-to-end throughput benchmarks: full syncs of `tap_abcfinancial.main`
+against the local mock API, over a matrix of club counts, records per club,
+page sizes, stream selections and injected latency.
+
+    python -m benchmarks.run --clubs 1,10 --records 5000,50000 \\
+        --streams members "members,checkins" --latency 0,0.05 \\
+        --output results.json --compare baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_api import Dataset, MockServer, MockOptions
+
+STREAM_NAMES = ['members', 'prospects', 'clubs', 'checkins', 'events']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clubs', default='1,5', type=_ints,
+                        help='comma separated club counts')
+    parser.add_argument('--records', default='10000', type=_ints,
+                        help='comma separated records per club and stream')
+    parser.add_argument('--page-sizes', default='5000', type=_ints,
+                        help='comma separated records per page')
+    parser.add_argument('--streams', default=['members'], nargs='+',
+                        help='stream selections, each a comma separated list')
+    parser.add_argument('--latency', default='0', type=_floats,
+                        help='comma separated seconds of latency per request')
+    parser.add_argument('--config', default='{}',
+                        help='JSON of extra tap config, e.g. concurrency options')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per case; the fastest is kept')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier output to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='slowdown in records/sec reported as a regression')
+    return parser.parse_args(argv)
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',')]
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',')]
+
+
+def cases(args):
+    """
+    Returns:
+        array of dicts, one per combination of the matrix
+    """
+    matrix = itertools.product(args.clubs, args.records, args.page_sizes,
+                               args.streams, args.latency)
+    return [{'clubs': clubs, 'records_per_club': records, 'page_size': page_size,
+             'streams': sorted(streams.split(',')), 'latency': latency}
+            for clubs, records, page_size, streams, latency in matrix]
+
+
+def case_name(case):
+    return 'clubs={clubs} records={records_per_club} page_size={page_size} ' \
+           'streams={streams} latency={latency}'.format(
+               **dict(case, streams='+'.join(case['streams'])))
+
+
+def run_tap(args, workdir, metrics_path, page_size):
+    """
+    Runs the tap in a child process, so that its RSS and CPU time are its own
+    """
+    command = [sys.executable, '-m', 'benchmarks.case', metrics_path, str(page_size),
+               '--'] + args
+    with open(os.path.join(workdir, 'tap.log'), 'w') as log:
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=log, check=True)
+    with open(metrics_path) as metrics:
+        return json.load(metrics)
+
+
+def discover(config_path):
+    output = subprocess.run(
+        [sys.executable, '-c', 'from tap_abcfinancial import main; main()',
+         '-c', config_path, '--discover'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def select_streams(catalog, streams):
+    for entry in catalog['streams']:
+        for field in entry['metadata']:
+            if not field['breadcrumb']:
+                field['metadata']['selected'] = entry['tap_stream_id'] in streams
+    return catalog
+
+
+def run_case(case, extra_config, repeat):
+    club_ids = [str(1000 + i) for i in range(case['clubs'])]
+    dataset = Dataset(records_per_club=case['records_per_club'],
+                      start='2020-01-01T00:00:00+00:00')
+    options = MockOptions(page_size=case['page_size'], latency=case['latency'])
+
+    with tempfile.TemporaryDirectory() as workdir, MockServer(dataset, options) as server:
+        config = dict({
+            'start_date': '2020-01-01T00:00:00Z',
+            'api_key': 'benchmark',
+            'app_id': 'benchmark',
+            'club_ids': club_ids,
+            'api_url': server.url,
+        }, **extra_config)
+        config_path = os.path.join(workdir, 'config.json')
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+
+        catalog_path = os.path.join(workdir, 'catalog.json')
+        with open(catalog_path, 'w') as catalog_file:
+            json.dump(select_streams(discover(config_path), case['streams']),
+                      catalog_file)
+
+        runs = []
+        for _ in range(repeat):
+            pages_before = server.stats.to_dict()['pages']
+            metrics = run_tap(['-c', config_path, '-p', catalog_path], workdir,
+                              os.path.join(workdir, 'metrics.json'), case['page_size'])
+            metrics['pages'] = server.stats.to_dict()['pages'] - pages_before
+            runs.append(metrics)
+
+    return summarize(min(runs, key=lambda run: run['wall_seconds']))
+
+
+def summarize(metrics):
+    records = metrics['records']
+    wall = metrics['wall_seconds']
+    return {
+        'records': records,
+        'pages': metrics['pages'],
+        'wall_seconds': round(wall, 4),
+        'records_per_second': round(records / wall, 1) if wall else None,
+        'pages_per_second': round(metrics['pages'] / wall, 2) if wall else None,
+        'peak_rss_mb': round(metrics['peak_rss_kb'] / 1024, 1),
+        'cpu_seconds': round(metrics['cpu_seconds'], 4),
+        'cpu_us_per_record': round(metrics['cpu_seconds'] / records * 1e6, 2)
+        if records else None,
+        'phase_seconds': {phase: round(seconds, 4)
+                          for phase, seconds in metrics['phase_seconds'].items()},
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Returns:
+        array of (case name, baseline records/sec, records/sec) for every case
+        that got more than `tolerance` slower
+    """
+    before = {case_name(result['case']): result['metrics']
+              for result in baseline['results']}
+    regressions = []
+    for result in results:
+        name = case_name(result['case'])
+        if name not in before or not before[name]['records_per_second']:
+            continue
+        old = before[name]['records_per_second']
+        new = result['metrics']['records_per_second'] or 0
+        if new < old * (1 - tolerance):
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    extra_config = json.loads(args.config)
+
+    results = []
+    for case in cases(args):
+        unknown = set(case['streams']) - set(STREAM_NAMES)
+        if unknown:
+            raise SystemExit('Unknown streams: {}'.format(', '.join(sorted(unknown))))
+
+        metrics = run_case(case, extra_config, args.repeat)
+        results.append({'case': case, 'metrics': metrics})
+        print('{}: {} records/s, {} pages/s, {} MB peak RSS, {} us CPU/record, {}'.format(
+            case_name(case), metrics['records_per_second'], metrics['pages_per_second'],
+            metrics['peak_rss_mb'], metrics['cpu_us_per_record'],
+            ' '.join('{}={}s'.format(k, v)
+                     for k, v in sorted(metrics['phase_seconds'].items()))))
+
+    output = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': extra_config,
+        'results': results,
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(output, output_file, indent=2)
+    print('Results written to {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file),
+                                           args.tolerance)
+        for name, old, new in regressions:
+            print('REGRESSION {}: {} -> {} records/s'.format(name, old, new))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
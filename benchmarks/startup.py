@@ -0,0 +1,101 @@
+"""
+Startup benchmarks: wall time of fresh tap processes for importing the
+package, discover mode and a small single-stream sync against the local mock
+API. A scenario slower than its target fails the run.
+
+    python -m benchmarks.startup --repeat 20 --stream clubs
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_api import Dataset, MockServer, MockOptions
+
+from .run import STREAM_NAMES, discover, select_streams
+
+TAP = 'from tap_abcfinancial import main; main()'
+
+# milliseconds; set with a stand-in for tap_kit, see the README
+DEFAULT_TARGETS = {
+    'import': 250,
+    'discover': 400,
+    'sync': 600,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='processes started per scenario')
+    parser.add_argument('--stream', default='clubs', choices=STREAM_NAMES,
+                        help='stream of the single-stream sync')
+    parser.add_argument('--records', type=int, default=10,
+                        help='records per club of the single-stream sync')
+    for scenario, target in sorted(DEFAULT_TARGETS.items()):
+        parser.add_argument('--{}-target'.format(scenario), type=float, default=target,
+                            help='milliseconds (default {})'.format(target))
+    return parser.parse_args(argv)
+
+
+def time_process(command, repeat):
+    """
+    Returns:
+        array of the wall milliseconds of `repeat` runs of `command`
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    dataset = Dataset(records_per_club=args.records, start='2020-01-01T00:00:00+00:00')
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockServer(dataset, MockOptions()) as server:
+        config_path = os.path.join(workdir, 'config.json')
+        with open(config_path, 'w') as config_file:
+            json.dump({
+                'start_date': '2020-01-01T00:00:00Z',
+                'api_key': 'benchmark',
+                'app_id': 'benchmark',
+                'club_ids': ['1000'],
+                'api_url': server.url,
+            }, config_file)
+
+        catalog_path = os.path.join(workdir, 'catalog.json')
+        with open(catalog_path, 'w') as catalog_file:
+            json.dump(select_streams(discover(config_path), [args.stream]), catalog_file)
+
+        scenarios = [
+            ('import', [sys.executable, '-c', 'import tap_abcfinancial']),
+            ('discover', [sys.executable, '-c', TAP, '-c', config_path, '--discover']),
+            ('sync', [sys.executable, '-c', TAP, '-c', config_path, '-p', catalog_path]),
+        ]
+
+        failed = False
+        for scenario, command in scenarios:
+            timings = time_process(command, args.repeat)
+            target = getattr(args, scenario + '_target')
+            slow = min(timings) > target
+            failed = failed or slow
+            print('{s}: min {mn:.0f} ms, median {md:.0f} ms, target {t:.0f} ms{f}'.format(
+                s=scenario, mn=min(timings), md=statistics.median(timings), t=target,
+                f=' SLOWER THAN TARGET' if slow else ''))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Microbenchmark of the window bookkeeping done for every page and window of
+30 day streams: paging and walking windows one at a time through
+`update_for_next_call`, and planning every window of a backfill up front with
+`get_window_requests`. No requests are made.
+
+    python -m benchmarks.windows --days 730 --clubs 50 --pages-per-window 3
+"""
+import argparse
+import time
+import types
+from datetime import timedelta
+
+from tap_abcfinancial import build_client
+from tap_abcfinancial.executor import ABCExecutor, PAGE_SIZE
+from tap_abcfinancial.windows import Window
+
+STREAM = types.SimpleNamespace(
+    stream='checkins',
+    stream_metadata={'incremental-search-key': 'checkInTimestampRange',
+                     'api-path': '/clubs/checkins/details'},
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.windows',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--days', type=int, default=730,
+                        help='days of history each club is backfilled from')
+    parser.add_argument('--clubs', type=int, default=50)
+    parser.add_argument('--pages-per-window', type=int, default=3,
+                        help='pages of each window, all full but the last')
+    return parser.parse_args(argv)
+
+
+def build_executor():
+    config = {'start_date': '2020-01-01T00:00:00Z', 'api_key': 'benchmark',
+              'app_id': 'benchmark', 'club_ids': []}
+    args = types.SimpleNamespace(config=config, state={}, catalog=None)
+    return ABCExecutor([], args, build_client(config))
+
+
+def walk(executor, start, clubs, pages_per_window):
+    """
+    Returns:
+        tuple (seconds, pages) of paging through every window of every club
+    """
+    pages = 0
+    started = time.perf_counter()
+    for club in range(clubs):
+        new_bookmark = executor.get_new_bookmark(STREAM, start)
+        request_config = executor.build_request_config(
+            STREAM, str(club), executor.build_initial_params(STREAM, Window(start,
+                                                                            new_bookmark)))
+        page = 0
+        while request_config['run']:
+            page += 1
+            count = PAGE_SIZE if page % pages_per_window else 0
+            request_config, new_bookmark = executor.update_for_next_call(
+                count, request_config, STREAM, new_bookmark)
+        pages += page
+    return time.perf_counter() - started, pages
+
+
+def plan(executor, start, clubs):
+    """
+    Returns:
+        tuple (seconds, windows) of planning every club's backfill
+    """
+    windows = 0
+    started = time.perf_counter()
+    for _ in range(clubs):
+        windows += len(executor.get_window_requests(STREAM, start))
+    return time.perf_counter() - started, windows
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    executor = build_executor()
+    start = executor.clock.now - timedelta(days=args.days)
+
+    seconds, pages = walk(executor, start, args.clubs, args.pages_per_window)
+    print('walk: {:.1f} us per page over {} pages'.format(seconds / pages * 1e6, pages))
+
+    seconds, windows = plan(executor, start, args.clubs)
+    print('plan: {:.1f} us per window over {} windows'.format(seconds / windows * 1e6,
+                                                               windows))
+
+
+if __name__ == '__main__':
+    main()
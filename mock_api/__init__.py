@@ -0,0 +1,5 @@
+"""
+Local stand-in for the ABC Financial API, for exercising the tap offline
+"""
+from .generator import Dataset
+from .server import MockServer, MockOptions
@@ -0,0 +1,86 @@
+import argparse
+import json
+import logging
+import sys
+
+from .generator import Dataset, STREAMS
+from .server import MockServer, MockOptions, PAGE_SIZE
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m mock_api',
+        description='Local stand-in for the ABC Financial API')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    serve = commands.add_parser('serve', help='serve synthetic data over HTTP')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                       help='records per page, at least {} (the tap takes a shorter '
+                            'page for the last one)'.format(PAGE_SIZE))
+    serve.add_argument('--latency', type=float, default=0.0,
+                       help='seconds every response is delayed by')
+    serve.add_argument('--jitter', type=float, default=0.0,
+                       help='up to this many more seconds of delay, at random')
+    serve.add_argument('--rate-limit-rate', type=float, default=0.0,
+                       help='share of requests answered with 429')
+    serve.add_argument('--server-error-rate', type=float, default=0.0,
+                       help='share of requests answered with 503')
+    serve.add_argument('--retry-after', type=int, default=1)
+    serve.add_argument('--no-gzip', action='store_true')
+    serve.add_argument('--club-ids', help='comma separated clubs to serve, default any')
+
+    generate = commands.add_parser('generate',
+                                   help='write synthetic records as JSON lines')
+    generate.add_argument('stream', choices=sorted(STREAMS))
+    generate.add_argument('--club-id', default='1234')
+
+    for command in (serve, generate):
+        command.add_argument('--records-per-club', type=int, default=1000)
+        command.add_argument('--start', default='2020-01-01T00:00:00+00:00')
+        command.add_argument('--end', default=None)
+        command.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve' and args.page_size < PAGE_SIZE:
+        parser.error('--page-size must be at least {}, the tap stops at the first '
+                     'page shorter than that'.format(PAGE_SIZE))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    dataset = Dataset(records_per_club=args.records_per_club,
+                      start=args.start,
+                      end=args.end,
+                      seed=args.seed)
+
+    if args.command == 'generate':
+        for record in dataset.select(args.stream, args.club_id):
+            sys.stdout.write(json.dumps(record) + '\n')
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    options = MockOptions(page_size=args.page_size,
+                          latency=args.latency,
+                          jitter=args.jitter,
+                          rate_limit_rate=args.rate_limit_rate,
+                          server_error_rate=args.server_error_rate,
+                          retry_after=args.retry_after,
+                          gzip=not args.no_gzip,
+                          club_ids=args.club_ids.split(',') if args.club_ids else None,
+                          seed=args.seed)
+    server = MockServer(dataset, options, host=args.host, port=args.port)
+    logging.info('Serving the mock ABC Financial API at %s', server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
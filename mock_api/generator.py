@@ -0,0 +1,209 @@
+import random
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from tap_abcfinancial.streams import (MembersStream, ProspectsStream, ClubsStream,
+                                      CheckInStream, EventsStream)
+
+STREAMS = {
+    cls.stream: cls
+    for cls in (MembersStream, ProspectsStream, ClubsStream, CheckInStream, EventsStream)
+}
+
+# the fields the API filters each incremental stream's search key on
+TIMESTAMP_PATHS = {
+    'members': ('personal', 'lastModifiedTimestamp'),
+    'prospects': ('personal', 'lastModifiedTimestamp'),
+    'checkins': ('checkInTimestamp',),
+    'events': ('modifiedTimestamp',),
+}
+
+# the fields holding each stream's primary key; only fields the stream's schema
+# defines, so that records never have a key the tap's schema does not (the
+# `clubs` schema has no id field, there is a single record per club)
+ID_PATHS = {
+    'members': [('memberId',)],
+    'prospects': [('prospectId',)],
+    'clubs': [],
+    'checkins': [('checkInId',)],
+    'events': [('eventId',)],
+}
+
+# distinct record bodies per stream; records only differ from their template
+# in their ids and timestamps, so building a page stays cheap
+TEMPLATES = 64
+
+_WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf',
+          'hotel', 'india', 'juliet', 'kilo', 'lima', 'mike', 'november']
+
+
+class Dataset:
+    """
+    Deterministic synthetic records for every stream of every club. A club's
+    incremental records are spread evenly between `start` and `end`, so any
+    date range holds a predictable number of them; record `i` of a club is the
+    same on every request.
+    """
+
+    def __init__(self, records_per_club=1000, start='2020-01-01T00:00:00+00:00',
+                 end=None, seed=0, records=None):
+        """
+        Args:
+            records_per_club (int): records of each incremental stream per club
+            start (str): ISO 8601 timestamp of each club's first record
+            end (str): ISO 8601 timestamp after the last record, default now
+            seed (int): varies the generated field values
+            records (dict): per stream overrides of `records_per_club`
+        """
+        self.records_per_club = records_per_club
+        self.records = records or {}
+        self.start = parse_datetime(start)
+        self.end = parse_datetime(end) if end else datetime.now(timezone.utc)
+        self.seed = seed
+        self.templates = {}
+
+    def count(self, stream, club_id, lower_bound=None, upper_bound=None):
+        """
+        Returns:
+            number of the club's records in [lower_bound, upper_bound]
+        """
+        first, last = self.index_range(stream, club_id, lower_bound, upper_bound)
+        return last - first
+
+    def select(self, stream, club_id, lower_bound=None, upper_bound=None,
+               offset=0, limit=None):
+        """
+        Returns:
+            array of the club's records in [lower_bound, upper_bound], ordered by
+            timestamp, skipping `offset` and returning at most `limit`; like the
+            API's date ranges, both bounds are included
+        """
+        first, last = self.index_range(stream, club_id, lower_bound, upper_bound)
+        first += offset
+        if limit is not None:
+            last = min(last, first + limit)
+        return [self.record(stream, club_id, i) for i in range(first, last)]
+
+    def index_range(self, stream, club_id, lower_bound=None, upper_bound=None):
+        total = self.total(stream)
+        if stream not in TIMESTAMP_PATHS:
+            return 0, total
+
+        step = self.step(stream)
+        first = 0 if lower_bound is None else self._index_at(lower_bound, step)
+        last = total if upper_bound is None else self._index_after(upper_bound, step)
+        return min(first, total), max(min(last, total), min(first, total))
+
+    def _index_at(self, moment, step):
+        # the index of the first record at or after `moment`
+        offset = (moment - self.start).total_seconds()
+        if offset <= 0:
+            return 0
+        index = int(offset // step)
+        return index if index * step >= offset else index + 1
+
+    def _index_after(self, moment, step):
+        # the index of the first record after `moment`
+        offset = (moment - self.start).total_seconds()
+        if offset < 0:
+            return 0
+        return int(offset // step) + 1
+
+    def total(self, stream):
+        if stream == 'clubs':
+            return 1
+        return int(self.records.get(stream, self.records_per_club))
+
+    def step(self, stream):
+        """
+        Returns:
+            seconds between two consecutive records of a club
+        """
+        return (self.end - self.start).total_seconds() / max(self.total(stream), 1)
+
+    def timestamp(self, stream, index):
+        return self.start + timedelta(seconds=index * self.step(stream))
+
+    def record(self, stream, club_id, index):
+        """
+        Returns:
+            record `index` of the club, valid against the stream's schema
+        """
+        templates = self.templates.get(stream)
+        if templates is None:
+            rng = random.Random('{}:{}'.format(self.seed, stream))
+            templates = self.templates[stream] = [
+                build_value(STREAMS[stream].schema, rng) for _ in range(TEMPLATES)
+            ]
+
+        record = copy_value(templates[(index + zlib.crc32(club_id.encode())) % TEMPLATES])
+        for path in ID_PATHS[stream]:
+            set_path(record, path, '{}-{}'.format(club_id, index))
+        if stream in TIMESTAMP_PATHS:
+            set_path(record, TIMESTAMP_PATHS[stream],
+                     format_datetime(self.timestamp(stream, index)))
+        if stream == 'checkins':
+            set_path(record, ('member', 'homeClub'), club_id)
+        return record
+
+
+def build_value(schema, rng):
+    """
+    Returns:
+        a random value valid against `schema`
+    """
+    types = schema.get('type', ['object'] if 'properties' in schema else ['string'])
+    if not isinstance(types, list):
+        types = [types]
+    types = [t for t in types if t != 'null'] or ['null']
+    typ = types[0]
+
+    if typ == 'object':
+        return {key: build_value(subschema, rng)
+                for key, subschema in schema.get('properties', {}).items()}
+    if typ == 'array':
+        items = schema.get('items', {'type': 'string'})
+        return [build_value(items, rng) for _ in range(rng.randint(0, 3))]
+    if schema.get('format') == 'date-time':
+        moment = datetime(2015, 1, 1, tzinfo=timezone.utc) + \
+            timedelta(seconds=rng.randint(0, 10 * 365 * 86400))
+        return format_datetime(moment)
+    if typ == 'integer':
+        return rng.randint(0, 100000)
+    if typ == 'number':
+        return round(rng.uniform(0, 1000), 2)
+    if typ == 'boolean':
+        return rng.random() < 0.5
+    if typ == 'null':
+        return None
+    return '{} {}'.format(rng.choice(_WORDS), rng.randint(0, 9999))
+
+
+def copy_value(value):
+    if isinstance(value, dict):
+        return {key: copy_value(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [copy_value(child) for child in value]
+    return value
+
+
+def set_path(record, path, value):
+    for key in path[:-1]:
+        record = record.setdefault(key, {})
+    record[path[-1]] = value
+
+
+def parse_datetime(value):
+    """
+    Reads both ISO 8601 timestamps and the 'YYYY-MM-DD HH:MM:SS.ffffff' bounds
+    the tap sends in its search keys; naive values are UTC
+    """
+    value = value.strip().replace('Z', '+00:00')
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def format_datetime(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
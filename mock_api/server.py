@@ -0,0 +1,229 @@
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from .generator import Dataset, STREAMS, parse_datetime
+
+LOGGER = logging.getLogger(__name__)
+
+PAGE_SIZE = 5000
+
+# api path -> stream, as the tap requests them
+ROUTES = {cls.meta_fields['api_path']: name for name, cls in STREAMS.items()}
+
+
+class MockOptions:
+    """
+    How the mock API behaves, besides the data it serves
+    """
+
+    def __init__(self, page_size=PAGE_SIZE, latency=0.0, jitter=0.0,
+                 rate_limit_rate=0.0, server_error_rate=0.0, retry_after=1,
+                 gzip=True, club_ids=None, seed=0):
+        """
+        Args:
+            page_size (int): records per page. The tap takes any page shorter
+                than its own `PAGE_SIZE` (5000) for the last one, so against
+                smaller pages it stops after the first; only clients paging by
+                the same size, like `benchmarks.case`, can use them
+            latency (float): seconds every response is delayed by
+            jitter (float): up to this many more seconds, at random
+            rate_limit_rate (float): share of requests answered with 429
+            server_error_rate (float): share of requests answered with 503
+            retry_after (int): `Retry-After` seconds sent with 429 and 503
+            gzip (bool): compress bodies for clients that accept it
+            club_ids (array [str]): the only clubs served, default any
+            seed (int): seeds the latency and error injection
+        """
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.gzip = gzip
+        self.club_ids = set(club_ids) if club_ids else None
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def roll(self):
+        with self.random_lock:
+            return self.random.random()
+
+
+class MockStats:
+    """
+    Counts of what the mock API answered, for tests and benchmarks
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.pages = 0
+        self.records = 0
+        self.throttled = 0
+        self.server_errors = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def to_dict(self):
+        with self.lock:
+            return {'requests': self.requests, 'pages': self.pages,
+                    'records': self.records, 'throttled': self.throttled,
+                    'server_errors': self.server_errors}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.stats.add(requests=1)
+
+        delay = server.options.latency
+        if server.options.jitter:
+            delay += server.options.jitter * server.options.roll()
+        if delay:
+            time.sleep(delay)
+
+        if not (self.headers.get('app_id') and self.headers.get('app_key')):
+            return self.send_json(401, {'status': {'message': 'unauthorized'}})
+
+        roll = server.options.roll()
+        if roll < server.options.rate_limit_rate:
+            server.stats.add(throttled=1)
+            return self.send_json(429, {'status': {'message': 'too many requests'}},
+                                  {'Retry-After': str(server.options.retry_after)})
+        if roll < server.options.rate_limit_rate + server.options.server_error_rate:
+            server.stats.add(server_errors=1)
+            return self.send_json(503, {'status': {'message': 'unavailable'}},
+                                  {'Retry-After': str(server.options.retry_after)})
+
+        url = urlparse(self.path)
+        route = self.route(url.path)
+        if route is None:
+            return self.send_json(404, {'status': {'message': 'not found'}})
+
+        club_id, stream = route
+        try:
+            body = self.page(stream, club_id, parse_qs(url.query))
+        except ValueError as exc:
+            return self.send_json(400, {'status': {'message': str(exc)}})
+        self.send_json(200, body)
+
+    def route(self, path):
+        """
+        Returns:
+            tuple (club_id, stream) for '/rest/{club_id}/{api path}', or None
+        """
+        parts = path.split('/', 3)
+        if len(parts) != 4 or parts[1] != 'rest':
+            return None
+        club_id, api_path = parts[2], '/' + parts[3]
+        if self.server.options.club_ids is not None and \
+                club_id not in self.server.options.club_ids:
+            return None
+        stream = ROUTES.get(api_path)
+        return (club_id, stream) if stream else None
+
+    def page(self, stream, club_id, query):
+        """
+        Returns:
+            the response envelope for one page of the club's records
+        """
+        dataset = self.server.dataset
+        response_key = STREAMS[stream].meta_fields['response_key']
+        page = int(query.get('page', ['1'])[0])
+
+        if stream == 'clubs':
+            record = dataset.record(stream, club_id, 0)
+            self.server.stats.add(pages=1, records=1)
+            return {'status': {'message': 'success', 'count': '1'},
+                    'request': {'clubNumber': club_id},
+                    response_key: record}
+
+        lower_bound = upper_bound = None
+        search_key = STREAMS[stream].meta_fields['incremental_search_key']
+        if search_key in query:
+            bounds = query[search_key][0].split(',')
+            if len(bounds) != 2:
+                raise ValueError('{} takes two comma separated dates'.format(search_key))
+            lower_bound, upper_bound = [parse_datetime(b) for b in bounds]
+
+        size = self.server.options.page_size
+        records = dataset.select(stream, club_id, lower_bound, upper_bound,
+                                 offset=(page - 1) * size, limit=size)
+        self.server.stats.add(pages=1, records=len(records))
+        return {'status': {'message': 'success', 'count': str(len(records))},
+                'request': {'clubNumber': club_id, 'page': str(page), 'size': str(size)},
+                response_key: records}
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        if self.server.options.gzip and \
+                'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format, *args)
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    Local stand-in for api.abcfinancial.com, serving `dataset` with the API's
+    envelope, search keys and pagination
+    """
+    daemon_threads = True
+
+    def __init__(self, dataset=None, options=None, host='127.0.0.1', port=0):
+        super(MockServer, self).__init__((host, port), MockHandler)
+        self.dataset = dataset or Dataset()
+        self.options = options or MockOptions()
+        self.stats = MockStats()
+        self.thread = None
+
+    @property
+    def url(self):
+        """
+        The tap's `api_url` for this server
+        """
+        host, port = self.server_address[:2]
+        return 'http://{}:{}/rest/'.format(host, port)
+
+    def start(self):
+        """
+        Serves requests on a background thread
+        """
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       name='abc-mock-api', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -14,13 +14,20 @@ setup(
         "pendulum==1.2.0",
         "tap-kit @ git+https://github.com/dmzobel/tap-kit.git@master"
     ],
+    extras_require={
+        "fast-json": ["orjson"],
+        "streaming": ["ijson>=3.1"],
+        "async": ["aiohttp"],
+    },
     dependency_links=[
         "https://github.com/dmzobel/tap-kit/tarball/master#egg=tap-kit-0.1.1",
     ],
     entry_points="""
     [console_scripts]
     tap-abcfinancial=tap_abcfinancial:main
+    tap-abcfinancial-merge-state=tap_abcfinancial.sharding:main
     """,
-    packages=["tap_abcfinancial"],
+    packages=["tap_abcfinancial", "tap_abcfinancial.schemas"],
+    package_data={"tap_abcfinancial.schemas": ["*.json"]},
     include_package_data=True,
 )
@@ -1,7 +1,5 @@
 from tap_kit import main_method
-from .client import ABCClient
 from .streams import MembersStream, ProspectsStream, ClubsStream, CheckInStream, EventsStream
-from .executor import ABCExecutor
 
 
 REQUIRED_CONFIG_KEYS = [
@@ -19,11 +17,40 @@ STREAMS = [
 ]
 
 
+# the client and executors pull in the HTTP, JSON and concurrency machinery,
+# so they are only imported once a run needs them
+def build_client(config):
+	from .client import ABCClient
+	return ABCClient(config)
+
+
+def build_executor(streams, args, client):
+	"""
+	Picks the execution engine named by the `engine` config option
+	"""
+	if client.config.get('engine', 'threads') == 'async':
+		from .async_executor import AsyncABCExecutor
+		return AsyncABCExecutor(streams, args, client)
+
+	from .executor import ABCExecutor
+	return ABCExecutor(streams, args, client)
+
+
+def __getattr__(name):
+	if name == 'ABCClient':
+		from .client import ABCClient
+		return ABCClient
+	if name == 'ABCExecutor':
+		from .executor import ABCExecutor
+		return ABCExecutor
+	raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
 def main():
 	main_method(
 		REQUIRED_CONFIG_KEYS,
-		ABCExecutor,
-		ABCClient,
+		build_executor,
+		build_client,
 		STREAMS
 	)
 
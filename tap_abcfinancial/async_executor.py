@@ -0,0 +1,186 @@
+import asyncio
+import itertools
+import math
+import threading
+
+import singer
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .concurrency import aimap_ordered, aimap_interleaved
+from .executor import ABCExecutor, STREAMS_TO_HYDRATE, PAGE_SIZE, CLUB_BUFFER_PAGES
+from .pages import parse_page
+
+LOGGER = singer.get_logger()
+
+
+class AsyncABCExecutor(ABCExecutor):
+    """
+    Runs the same pagination and window logic as ABCExecutor, but requests are
+    made with aiohttp on an event loop, so hundreds of clubs can be in flight
+    without a thread each. Records and bookmarks are still written by the
+    calling thread, each club's in the same order as ABCExecutor writes them.
+    """
+
+    def __init__(self, streams, args, client):
+        if aiohttp is None:
+            raise RuntimeError("The async engine requires the `aiohttp` package")
+
+        super(AsyncABCExecutor, self).__init__(streams, args, client)
+
+        self.async_concurrency = int(self.client.config.get('async_concurrency', 50))
+        # responses are read whole by aiohttp
+        self.stream_json = False
+        self.loop = None
+        self.session = None
+
+    def sync(self):
+        self.loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=self.loop.run_forever,
+                                       name='abc-event-loop',
+                                       daemon=True)
+        loop_thread.start()
+
+        try:
+            self.session = self.run_coroutine(self.open_session())
+            super(AsyncABCExecutor, self).sync()
+        finally:
+            if self.session is not None:
+                self.run_coroutine(self.session.close())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            loop_thread.join()
+            self.loop.close()
+
+    async def open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.async_concurrency)
+        return aiohttp.ClientSession(connector=connector,
+                                     headers={'Accept-Encoding': 'gzip, deflate'})
+
+    def run_coroutine(self, coroutine):
+        """
+        Runs `coroutine` on the event loop and blocks the calling thread until it
+        is done
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def iterate(self, async_iterator):
+        """
+        Returns:
+            generator over `async_iterator`, for the (synchronous) writing thread
+        """
+        while True:
+            try:
+                yield self.run_coroutine(async_iterator.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def map_clubs(self, extract):
+        """
+        Runs `extract` for up to `async_concurrency` clubs at a time on the event loop
+        Returns:
+            generator of (club_id, (Page, upper bound)) tuples, like
+            `ABCExecutor.map_clubs`
+        """
+        clubs = aimap_interleaved(extract,
+                                  self.club_ids,
+                                  max_tasks=self.async_concurrency,
+                                  buffer_size=self.async_concurrency * CLUB_BUFFER_PAGES)
+        try:
+            yield from self.iterate(clubs)
+        finally:
+            self.run_coroutine(clubs.aclose())
+
+    def request_club_pages(self, stream, club_id, request_config, curr_upper_bound=None):
+        # responses are read whole, never streamed
+        return self.request_pages(stream, club_id, request_config, curr_upper_bound)
+
+    async def request_window_pages(self, stream, club_id, last_updated, in_flight=None,
+                                   density=None):
+        windows = self.get_window_requests(stream, last_updated, in_flight, density)
+
+        LOGGER.info("Backfilling {s} for club {c} from {d} in {n} windows".format(
+            s=stream, c=club_id, d=last_updated, n=len(windows))
+        )
+
+        def extract(window):
+            params, upper_bound = window
+            request_config = self.build_request_config(stream, club_id, params)
+            if self.adaptive_windows and params['page'] == 1:
+                return self.request_split_pages(stream, club_id, request_config,
+                                                upper_bound)
+            return self.request_pages(stream, club_id, request_config, upper_bound,
+                                      follow_windows=False)
+
+        ordered = aimap_ordered(extract, windows, max_tasks=self.backfill_concurrency)
+        async for _, pages in ordered:
+            async for page in pages:
+                yield page
+
+    async def request_split_pages(self, stream, club_id, request_config, upper_bound):
+        first = await self.request_page(stream, club_id, request_config, upper_bound)
+        yield first
+        if first[0].count < PAGE_SIZE:
+            return
+
+        LOGGER.info("Requesting the pages of {s} for club {c} after page {p} "
+                    "{n} at a time".format(s=stream, c=club_id, p=first[0].number,
+                                           n=self.backfill_concurrency))
+        last_page = [math.inf]
+
+        async def extract(number):
+            if number > last_page[0]:
+                return
+            page_config = dict(request_config,
+                               params=dict(request_config['params'], page=number))
+            page = await self.request_page(stream, club_id, page_config, upper_bound)
+            if page[0].count < PAGE_SIZE:
+                last_page[0] = min(last_page[0], number)
+            yield page
+
+        ordered = aimap_ordered(extract,
+                                itertools.count(request_config['params']['page'] + 1),
+                                max_tasks=self.backfill_concurrency)
+        try:
+            async for _, pages in ordered:
+                async for page in pages:
+                    yield page
+                    if page[0].count < PAGE_SIZE:
+                        return
+        finally:
+            await ordered.aclose()
+
+    async def request_page(self, stream, club_id, request_config, upper_bound):
+        pages = self.request_pages(stream, club_id, request_config, upper_bound,
+                                   follow_windows=False)
+        try:
+            return await pages.__anext__()
+        finally:
+            await pages.aclose()
+
+    async def request_pages(self, stream, club_id, request_config, curr_upper_bound=None,
+                            follow_windows=True):
+        while request_config['run']:
+            body = await self.client.make_async_request(self.session, request_config)
+            with self.client.metrics.timer('page_decode',
+                                           **self.metric_tags(stream, club_id)):
+                page = parse_page(body,
+                                  stream.stream_metadata['response-key'],
+                                  params=dict(request_config['params']))
+            self.log_page(stream, club_id, page)
+
+            # for endpoints that do not provide club_id
+            if stream.stream in STREAMS_TO_HYDRATE:
+                self.hydrate_record_with_club_id(page.records, club_id)
+
+            yield page, curr_upper_bound
+
+            request_config, curr_upper_bound = self.update_for_next_call(
+                page.count,
+                request_config,
+                stream,
+                curr_upper_bound,
+                follow_windows
+            )
@@ -1,30 +1,179 @@
+import random
+
 import singer
 import backoff
+import requests
+from requests.adapters import HTTPAdapter
 
 from tap_kit import BaseClient
+from .metrics import build_metrics
+from .ratelimit import RateLimiter, parse_retry_after
 
 LOGGER = singer.get_logger()
 
+MAX_TRIES = 10
+SERVER_ERROR_CODES = [500, 502, 503, 504]
+
 
 class RateLimitException(Exception):
     pass
 
 
+class ServerErrorException(Exception):
+    pass
+
+
 class ABCClient(BaseClient):
+
+    def __init__(self, config):
+        super(ABCClient, self).__init__(config)
+
+        # one connection per request the executor can have in flight
+        backfill_concurrency = int(config.get('backfill_concurrency', 1))
+        if config.get('adaptive_windows'):
+            # the pages after a full first page are requested
+            # `backfill_concurrency` at a time within each window
+            backfill_concurrency *= backfill_concurrency
+        concurrency = int(config.get('stream_concurrency', 1)) * \
+            int(config.get('club_concurrency', 1)) * backfill_concurrency
+        pool_size = int(config.get('http_pool_size', concurrency))
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+
+        max_rate = config.get('max_requests_per_second')
+        self.rate_limiter = RateLimiter(
+            max_rate=float(max_rate) if max_rate is not None else None
+        )
+        self.metrics = build_metrics(config)
+
     @backoff.on_exception(backoff.expo,
-                          RateLimitException,
-                          max_tries=10,
+                          ServerErrorException,
+                          max_tries=MAX_TRIES,
                           factor=2)
-    def make_request(self, request_config, body=None, method='GET'):
+    # throttled requests are retried straight away: the wait the server asked
+    # for is enforced by the rate limiter, for every worker at once
+    @backoff.on_exception(backoff.constant,
+                          RateLimitException,
+                          max_tries=MAX_TRIES,
+                          interval=0)
+    def make_request(self, request_config, body=None, method='GET', stream=False):
+        """
+        Args:
+            stream (bool): leave the body unread, so it can be decoded
+                incrementally from `response.raw`
+        """
+        tags = request_config.get('tags', {})
+        waited = self.rate_limiter.acquire()
+        if waited > 0:
+            self.metrics.timing('throttle_sleep', waited, **tags)
+
         LOGGER.info("Making {} request to {}".format(
             method, request_config['url']))
 
-        with singer.metrics.Timer('request_duration', {}) as timer:
-            response = self.requests_method(method, request_config, body)
+        with self.metrics.timer('request_duration', **tags) as timer_tags:
+            # the pooled session keeps connections (and their TLS sessions)
+            # alive across pages, clubs and streams
+            response = self.session.request(method,
+                                            request_config['url'],
+                                            headers=request_config['headers'],
+                                            params=request_config['params'],
+                                            json=body,
+                                            stream=stream)
+            if stream:
+                # transparently gunzip when reading from `response.raw`
+                response.raw.decode_content = True
+            timer_tags['http_status_code'] = response.status_code
 
-        if response.status_code in [429, 500, 503]:
+        if response.status_code == 429:
+            # hand the connection back to the pool before retrying
+            response.close()
+            self.rate_limiter.on_throttled(response.headers)
+            self.metrics.counter('request_retries', reason='throttled', **tags)
             raise RateLimitException()
 
+        if response.status_code in SERVER_ERROR_CODES:
+            response.close()
+            retry_after = parse_retry_after(response.headers)
+            if retry_after is not None:
+                self.rate_limiter.pause(retry_after)
+            self.metrics.counter('request_retries', reason='server_error', **tags)
+            raise ServerErrorException()
+
         response.raise_for_status()
+        self.rate_limiter.on_success(response.headers)
+
+        # streamed bodies are only counted when the server sends their length
+        received = response.headers.get('Content-Length') if stream \
+            else len(response.content)
+        if received is not None:
+            self.metrics.counter('response_bytes', int(received), **tags)
 
         return response
+
+    async def make_async_request(self, session, request_config, body=None, method='GET'):
+        """
+        Coroutine counterpart of `make_request`, used by AsyncABCExecutor; retries
+        and throttling follow the same rules and share the same rate limiter
+        Args:
+            session (aiohttp.ClientSession)
+        Returns:
+            the response body (bytes)
+        """
+        # only the async engine needs asyncio, so it is not imported up front
+        import asyncio
+
+        throttled = server_errors = 0
+        tags = request_config.get('tags', {})
+        # aiohttp only takes strings as query values
+        params = {k: str(v) for k, v in request_config['params'].items()}
+
+        while True:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                self.metrics.timing('throttle_sleep', wait, **tags)
+                await asyncio.sleep(wait)
+
+            LOGGER.info("Making {} request to {}".format(
+                method, request_config['url']))
+
+            with self.metrics.timer('request_duration', **tags) as timer_tags:
+                async with session.request(method,
+                                           request_config['url'],
+                                           headers=request_config['headers'],
+                                           params=params,
+                                           json=body) as response:
+                    content = await response.read()
+                timer_tags['http_status_code'] = response.status
+
+            if response.status == 429:
+                self.rate_limiter.on_throttled(response.headers)
+                self.metrics.counter('request_retries', reason='throttled', **tags)
+                throttled += 1
+                if throttled >= MAX_TRIES:
+                    raise RateLimitException()
+                continue
+
+            if response.status in SERVER_ERROR_CODES:
+                self.metrics.counter('request_retries', reason='server_error', **tags)
+                server_errors += 1
+                if server_errors >= MAX_TRIES:
+                    raise ServerErrorException()
+                retry_after = parse_retry_after(response.headers)
+                if retry_after is not None:
+                    self.rate_limiter.pause(retry_after)
+                # same full-jitter exponential wait as `backoff.expo`, factor 2
+                await asyncio.sleep(random.uniform(0, 2 * 2 ** (server_errors - 1)))
+                continue
+
+            response.raise_for_status()
+            self.rate_limiter.on_success(response.headers)
+            self.metrics.counter('response_bytes', len(content), **tags)
+
+            return content
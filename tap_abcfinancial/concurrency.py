@@ -0,0 +1,280 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+# the result `imap_interleaved` and `aimap_interleaved` yield for an item once
+# all of its results have been yielded
+ITEM_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def imap_ordered(producer, items, max_workers=1, buffer_size=2):
+    """
+    Runs `producer(item)` for every item on a bounded pool of worker threads
+    Args:
+        producer (callable): takes an item and returns an iterable of results
+        items (iterable): the items to produce results for
+        max_workers (int): number of items being produced at the same time
+        buffer_size (int): results held per item before its worker blocks
+    Returns:
+        generator of (item, iterator of results) tuples, in the order of `items`;
+        each iterator must be exhausted before the next tuple is requested
+    """
+    if max_workers <= 1:
+        # nothing to overlap, keep everything on the calling thread
+        for item in items:
+            yield item, iter(producer(item))
+        return
+
+    stop = threading.Event()
+
+    def work(item, results):
+        _produce(lambda: producer(item), results, stop)
+
+    pending = deque()
+    items = iter(items)
+    # only submit a couple of items ahead per worker, so workers cannot buffer
+    # every remaining item while the consumer is stuck on a large one
+    lookahead = max_workers * 2
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            for item in items:
+                results = queue.Queue(maxsize=buffer_size)
+                pool.submit(work, item, results)
+                pending.append((item, results))
+                if len(pending) >= lookahead:
+                    break
+
+            if not pending:
+                return
+
+            item, results = pending.popleft()
+            yield item, _drain(results)
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+
+
+def imap_interleaved(producer, items, max_workers=1, buffer_size=2):
+    """
+    Runs `producer(item)` for every item on a bounded pool of worker threads,
+    like `imap_ordered`, except that results are yielded as soon as any worker
+    has one, so that no item waits for the items before it to be consumed
+    Args:
+        producer (callable): takes an item and returns an iterable of results
+        items (iterable): the items to produce results for
+        max_workers (int): number of items being produced at the same time
+        buffer_size (int): results held across all items before workers block
+    Returns:
+        generator of (item, result) tuples, each item's results in order and
+        followed by (item, `ITEM_DONE`)
+    """
+    stop = threading.Event()
+    results = queue.Queue(maxsize=max(buffer_size, 1))
+
+    def work(item):
+        if stop.is_set():
+            # the consumer has gone away before the item was started
+            return
+        try:
+            for result in producer(item):
+                if not _put(results, (item, result), stop):
+                    return
+        except Exception as exc:  # re-raised on the consuming thread
+            _put(results, _Failure(exc), stop)
+        else:
+            _put(results, (item, ITEM_DONE), stop)
+
+    pool = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+    try:
+        pending = 0
+        for item in items:
+            pool.submit(work, item)
+            pending += 1
+
+        while pending:
+            result = results.get()
+            if isinstance(result, _Failure):
+                raise result.exc
+            if result[1] is ITEM_DONE:
+                pending -= 1
+            yield result
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+
+
+def prefetch(iterable, buffer_size=1):
+    """
+    Iterates `iterable` on a background thread, so that producing the next
+    results overlaps with the consumer handling the current one
+    Args:
+        iterable (iterable): consumed on the background thread only
+        buffer_size (int): results held before the background thread blocks
+    Returns:
+        generator of the results of `iterable`, in order
+    """
+    stop = threading.Event()
+    results = queue.Queue(maxsize=buffer_size)
+    worker = threading.Thread(target=_produce,
+                              args=(lambda: iterable, results, stop),
+                              name='abc-prefetch',
+                              daemon=True)
+    worker.start()
+    try:
+        yield from _drain(results)
+    finally:
+        stop.set()
+        worker.join()
+
+
+def _produce(produce, results, stop):
+    """
+    Queues every result of `produce()`, then `_DONE` or the exception raised
+    """
+    try:
+        for result in produce():
+            if not _put(results, result, stop):
+                return
+    except Exception as exc:  # re-raised on the consuming thread
+        _put(results, _Failure(exc), stop)
+    else:
+        _put(results, _DONE, stop)
+
+
+def _put(results, result, stop):
+    """
+    Blocking put that gives up once the consumer has gone away
+    Returns:
+        True if `result` was queued
+    """
+    while not stop.is_set():
+        try:
+            results.put(result, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(results):
+    while True:
+        result = results.get()
+        if result is _DONE:
+            return
+        if isinstance(result, _Failure):
+            raise result.exc
+        yield result
+
+
+async def aimap_ordered(producer, items, max_tasks=1, buffer_size=2):
+    """
+    asyncio counterpart of `imap_ordered`
+    Args:
+        producer (callable): takes an item and returns an async iterable of results
+        items (iterable): the items to produce results for
+        max_tasks (int): number of items being produced at the same time
+        buffer_size (int): results held per item before its task waits
+    Returns:
+        async generator of (item, async iterator of results) tuples, in the order
+        of `items`; each iterator must be exhausted before the next tuple is requested
+    """
+    import asyncio  # loaded by the async engine only
+
+    async def work(item, results):
+        try:
+            async for result in producer(item):
+                await results.put(result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # re-raised in the consuming task
+            await results.put(_Failure(exc))
+        else:
+            await results.put(_DONE)
+
+    pending = deque()
+    current = None
+    items = iter(items)
+
+    try:
+        while True:
+            for item in items:
+                results = asyncio.Queue(maxsize=buffer_size)
+                task = asyncio.ensure_future(work(item, results))
+                pending.append((item, results, task))
+                if len(pending) >= max(max_tasks, 1):
+                    break
+
+            if not pending:
+                return
+
+            item, results, current = pending.popleft()
+            yield item, _adrain(results)
+    finally:
+        if current is not None:
+            current.cancel()
+        for _, _, task in pending:
+            task.cancel()
+
+
+async def aimap_interleaved(producer, items, max_tasks=1, buffer_size=2):
+    """
+    asyncio counterpart of `imap_interleaved`
+    Args:
+        producer (callable): takes an item and returns an async iterable of results
+        items (iterable): the items to produce results for
+        max_tasks (int): number of items being produced at the same time
+        buffer_size (int): results held across all items before tasks wait
+    Returns:
+        async generator of (item, result) tuples, each item's results in order
+        and followed by (item, `ITEM_DONE`)
+    """
+    import asyncio  # loaded by the async engine only
+
+    results = asyncio.Queue(maxsize=max(buffer_size, 1))
+    slots = asyncio.Semaphore(max(max_tasks, 1))
+
+    async def work(item):
+        async with slots:
+            try:
+                async for result in producer(item):
+                    await results.put((item, result))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # re-raised in the consuming task
+                await results.put(_Failure(exc))
+            else:
+                await results.put((item, ITEM_DONE))
+
+    tasks = [asyncio.ensure_future(work(item)) for item in items]
+    pending = len(tasks)
+    try:
+        while pending:
+            result = await results.get()
+            if isinstance(result, _Failure):
+                raise result.exc
+            if result[1] is ITEM_DONE:
+                pending -= 1
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _adrain(results):
+    while True:
+        result = await results.get()
+        if result is _DONE:
+            return
+        if isinstance(result, _Failure):
+            raise result.exc
+        yield result
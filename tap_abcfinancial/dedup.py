@@ -0,0 +1,126 @@
+import hashlib
+from collections import Counter, OrderedDict
+
+# the field of each stream's records holding the time they last changed;
+# together with the primary key it identifies one version of a record
+REPLICATION_TIMESTAMP_PATHS = {
+    'members': ('personal', 'lastModifiedTimestamp'),
+    'prospects': ('personal', 'lastModifiedTimestamp'),
+    'checkins': ('checkInTimestamp',),
+    'events': ('modifiedTimestamp',),
+}
+
+# fields identifying a record of streams whose `table-key-properties` are not
+# on their records; `events` are declared keyed on `id` but carry `eventId`
+KEY_PROPERTIES = {
+    'events': ['eventId'],
+}
+
+# most digests of a club's latest records kept in the state for the next run
+BOUNDARY_SIZE = 1000
+
+
+class RecordDedup:
+    """
+    Drops records already written in this run, or written at the boundary
+    with the previous run, by keeping 8 byte digests of each record's club,
+    primary key and replication timestamp in an LRU of `size` entries. A later
+    version of a record has another timestamp, so it is never dropped.
+    """
+
+    def __init__(self, stream_name, key_properties, size):
+        """
+        Args:
+            stream_name (str)
+            key_properties (arr[str]): the stream's `table-key-properties`
+            size (int): digests kept
+        """
+        self.key_properties = KEY_PROPERTIES.get(stream_name, key_properties)
+        self.timestamp_path = REPLICATION_TIMESTAMP_PATHS.get(stream_name)
+        self.size = size
+        self.seen = OrderedDict()
+        self.dropped = Counter()
+        # club_id -> (latest replication timestamp, dict of the digests of its
+        # records, used as an ordered set)
+        self.latest = {}
+
+    def seed(self, digests):
+        """
+        Args:
+            digests (arr[str]): `boundary` digests saved by the previous run
+        """
+        for digest in digests:
+            self.remember(int(digest, 16))
+
+    def filter(self, club_id, records):
+        """
+        Returns:
+            generator of the records not seen before
+        """
+        for record in records:
+            key = self.key(club_id, record)
+            if key is None:
+                yield record
+                continue
+
+            digest, timestamp = key
+            if digest in self.seen:
+                self.seen.move_to_end(digest)
+                self.dropped[club_id] += 1
+                continue
+
+            self.remember(digest)
+            if timestamp is not None:
+                self.track_latest(club_id, timestamp, digest)
+            yield record
+
+    def key(self, club_id, record):
+        """
+        Returns:
+            (digest, replication timestamp) of the record, or None when it
+            cannot be told apart from other records or other versions of itself
+        """
+        timestamp = None
+        if self.timestamp_path is not None:
+            timestamp = _get_path(record, self.timestamp_path)
+            if timestamp is None:
+                return None
+
+        keys = tuple(record.get(key) for key in self.key_properties)
+        if not keys or None in keys:
+            # a record missing its primary key would collide with every other
+            # version of every record of the club sharing its timestamp
+            return None
+
+        values = (club_id, timestamp) + keys
+        digest = hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big'), timestamp
+
+    def remember(self, digest):
+        self.seen[digest] = None
+        if len(self.seen) > self.size:
+            self.seen.popitem(last=False)
+
+    def track_latest(self, club_id, timestamp, digest):
+        latest, digests = self.latest.get(club_id, (None, None))
+        if latest is None or timestamp > latest:
+            self.latest[club_id] = (timestamp, {digest: None})
+        elif timestamp == latest and len(digests) < BOUNDARY_SIZE:
+            digests[digest] = None
+
+    def boundary(self, club_id):
+        """
+        Returns:
+            hex digests of the club's records with the latest replication
+            timestamp written in this run, the ones the next run will fetch again
+        """
+        _, digests = self.latest.get(club_id, (None, {}))
+        return ['{:016x}'.format(digest) for digest in digests]
+
+
+def _get_path(record, path):
+    for key in path:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
@@ -1,10 +1,26 @@
+import functools
+import hashlib
+import itertools
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import singer
 import pendulum
 
 from tap_kit import TapExecutor
-from tap_kit.utils import (transform_write_and_count,
-                           format_last_updated_for_request)
+from tap_kit.utils import format_last_updated_for_request
+from .concurrency import imap_ordered, imap_interleaved, prefetch, ITEM_DONE
+from .dedup import RecordDedup
+from .pages import parse_page, stream_page, ijson, JSON_BACKEND
+from .output import RecordWriter, DEFAULT_BUFFER_SIZE
+from .profiling import profiled
+from .sharding import shard_club_ids, prune_bookmarks
+from .state import StateWriter, expand_state, DEFAULT_FLUSH_INTERVAL
 from .streams import ABCStream
+from .windows import RunClock, Window, THIRTY_DAY_STREAMS, parse_datetime
 
 LOGGER = singer.get_logger()
 
@@ -19,25 +35,133 @@ class ABCExecutor(TapExecutor):
             client (BaseClient)
         """
         super(ABCExecutor, self).__init__(streams, args, client)
+        # bookmarks are read and written nested, whatever layout the state
+        # was given in
+        expand_state(self.state)
 
         self.replication_key_format = 'datetime_string'
-        self.url = 'https://api.abcfinancial.com/rest/'
+        # every window and bookmark of the run ends at the time it started
+        self.clock = RunClock()
+        # overridable, e.g. to point the tap at a local stand-in of the API
+        self.url = self.client.config.get('api_url', 'https://api.abcfinancial.com/rest/')
         self.api_key = self.client.config['api_key']
         self.app_id = self.client.config['app_id']
+        # with `shard_count` > 1, this process only syncs its own share of
+        # `club_ids`, and other processes sync the rest
+        self.shard_index = int(self.client.config.get('shard_index', 0))
+        self.shard_count = int(self.client.config.get('shard_count', 1))
+        self.club_ids = shard_club_ids(self.client.config['club_ids'],
+                                       self.shard_index, self.shard_count)
+        self.club_concurrency = int(self.client.config.get('club_concurrency', 1))
+        self.backfill_concurrency = int(self.client.config.get('backfill_concurrency', 1))
+        self.stream_concurrency = int(self.client.config.get('stream_concurrency', 1))
+        self.adaptive_windows = bool(self.client.config.get('adaptive_windows'))
+        self.window_target_records = int(self.client.config.get(
+            'window_target_records', DEFAULT_WINDOW_TARGET_RECORDS))
+        # records of each stream's digests kept to drop repeated records, 0 to
+        # write every record the API returns
+        self.dedup_cache_size = int(self.client.config.get('dedup_cache_size', 0))
+        self.dedup = {}
+        self.change_detection = bool(self.client.config.get('change_detection'))
+        self.refresh_interval = pendulum.Interval(hours=float(self.client.config.get(
+            'change_detection_refresh_hours', DEFAULT_REFRESH_INTERVAL_HOURS)))
+
+        # held for every stdout write and state change, so that streams synced
+        # at the same time never interleave partial messages or read a
+        # half-updated state
+        self.output_lock = threading.RLock()
+
+        self.record_writer = RecordWriter(
+            buffer_size=int(self.client.config.get('record_buffer_size',
+                                                   DEFAULT_BUFFER_SIZE))
+        )
+        self.state_writer = StateWriter(
+            self.state,
+            flush_interval=float(self.client.config.get('state_flush_interval',
+                                                        DEFAULT_FLUSH_INTERVAL)),
+            flush_records=int(self.client.config.get('state_flush_records', 0)),
+            record_writer=self.record_writer,
+            state_format=self.client.config.get('state_format', 'nested')
+        )
+
+        # a streamed page has to be written before its request can be paged
+        # forward, so it is only possible when pages are consumed in line
+        self.stream_json = bool(self.client.config.get('stream_json')) and \
+            self.club_concurrency <= 1
+        if self.stream_json and ijson is None:
+            LOGGER.warning("`stream_json` requires the `ijson` package, "
+                           "falling back to decoding whole pages")
+            self.stream_json = False
+
+        # pages requested ahead of the one being written, when clubs are not
+        # already extracted on worker threads
+        self.prefetch_pages = int(self.client.config.get('prefetch_pages', 1))
+        if self.stream_json:
+            self.prefetch_pages = 0
+
+        LOGGER.info("Decoding API responses with {}".format(
+            'ijson' if self.stream_json else JSON_BACKEND))
+        if self.shard_count > 1:
+            LOGGER.info("Shard {i} of {c}: syncing {n} of {t} clubs".format(
+                i=self.shard_index, c=self.shard_count, n=len(self.club_ids),
+                t=len(self.client.config['club_ids'])))
 
     def sync(self):
         self.set_catalog()
 
-        for c in self.selected_catalog:
-            self.sync_stream(
-                ABCStream(config=self.config, state=self.state, catalog=c)
-            )
+        streams = [ABCStream(config=self.config, state=self.state, catalog=c,
+                             state_writer=self.state_writer)
+                   for c in self.selected_catalog]
+
+        # clubs removed from `club_ids` keep no bookmarks, and a shard's state
+        # only holds its own clubs, so that merging the shards' states back
+        # together never has to pick between them
+        if prune_bookmarks(self.state, self.club_ids):
+            self.state_writer.changed()
+
+        try:
+            with profiled(self.client.config, type(self)):
+                self.sync_streams(streams)
+        finally:
+            # every bookmark in the state belongs to records already written,
+            # so the last one is worth keeping even if the sync failed
+            with self.output_lock:
+                self.record_writer.flush()
+                self.state_writer.flush()
+            self.client.metrics.flush()
+
+    def sync_streams(self, streams):
+        if self.stream_concurrency <= 1:
+            for stream in streams:
+                self.sync_stream(stream)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.stream_concurrency) as pool:
+            futures = [pool.submit(self.sync_stream, stream) for stream in streams]
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    # streams that have not started yet are dropped
+                    for other in futures:
+                        other.cancel()
+                    raise future.exception()
 
     def sync_stream(self, stream):
-        stream.write_schema()
+        with self.output_lock:
+            stream.write_schema()
+
+        if self.dedup_cache_size > 0:
+            dedup = RecordDedup(stream.stream,
+                                stream.stream_metadata.get('table-key-properties', []),
+                                self.dedup_cache_size)
+            if stream.is_incremental:
+                with self.output_lock:
+                    for club_id in self.club_ids:
+                        dedup.seed(stream.get_dedup_boundary(club_id))
+            self.dedup[stream.stream] = dedup
 
         if stream.is_incremental:
-            stream.set_stream_state(self.state)
+            with self.output_lock:
+                stream.set_stream_state(self.state)
             self.call_incremental_stream(stream)
         else:
             self.call_full_stream(stream)
@@ -46,28 +170,56 @@ class ABCExecutor(TapExecutor):
         """
         Method to call all incremental synced streams
         """
+        # bookmarks are read (and seeded from `start_date`) up front, so that
+        # worker threads never touch the state
+        with self.output_lock:
+            last_updated = {
+                club_id: parse_datetime(format_last_updated_for_request(
+                    stream.update_and_return_bookmark(club_id),
+                    self.replication_key_format
+                ))
+                for club_id in self.club_ids
+            }
+            in_flight = {
+                club_id: stream.get_page_checkpoint(club_id)
+                for club_id in self.club_ids
+            }
+            density = {
+                club_id: stream.get_density(club_id)
+                for club_id in self.club_ids
+            }
 
-        # need to call each club ID individually
-        for club_id in self.client.config['club_ids']:
+        def extract(club_id):
+            if self.adaptive_windows or \
+                    stream.stream in THIRTY_DAY_STREAMS and self.backfill_concurrency > 1:
+                return self.request_window_pages(stream, club_id, last_updated[club_id],
+                                                 in_flight[club_id], density[club_id])
 
-            last_updated = format_last_updated_for_request(
-                stream.update_and_return_bookmark(club_id),
-                self.replication_key_format
-            )
-            new_bookmark = self.get_new_bookmark(stream, last_updated)
+            if in_flight[club_id]:
+                params, new_bookmark = self.build_resume_params(stream, in_flight[club_id])
 
-            request_config = {
-                'url': self.generate_api_url(stream, club_id),
-                'headers': self.build_headers(),
-                'params': self.build_initial_params(stream, last_updated, new_bookmark),
-                'run': True
-            }
+                LOGGER.info("Resuming {s} for club {c} at page {p} of {r}".format(
+                    s=stream, c=club_id, p=params['page'], r=in_flight[club_id]['range'])
+                )
+            else:
+                new_bookmark = self.get_new_bookmark(stream, last_updated[club_id])
+                params = self.build_initial_params(stream, Window(last_updated[club_id],
+                                                                  new_bookmark))
 
-            LOGGER.info("Extracting {s} for club {c} from {d} to {n}".format(
-                s=stream, c=club_id, d=last_updated, n=new_bookmark)
-            )
+                LOGGER.info("Extracting {s} for club {c} from {d} to {n}".format(
+                    s=stream, c=club_id, d=last_updated[club_id], n=new_bookmark)
+                )
+
+            request_config = self.build_request_config(stream, club_id, params)
+
+            return self.request_club_pages(stream, club_id, request_config, new_bookmark)
+
+        def checkpoint(club_id, bookmark):
+            self.update_bookmark(stream, bookmark, club_id)
 
-            final_bookmark = self.call_stream(stream, club_id, request_config, new_bookmark)
+        # need to call each club ID individually
+        for club_id, club in self.write_clubs(stream, self.map_clubs(extract), checkpoint):
+            final_bookmark = club.upper_bound
 
             LOGGER.info('Setting {s} last updated for club {c} to {b}'.format(
                 s=stream,
@@ -75,72 +227,427 @@ class ABCExecutor(TapExecutor):
                 b=final_bookmark
             ))
 
-            stream.update_bookmark(final_bookmark, club_id)
+            density_changed = self.adaptive_windows and not in_flight[club_id] and \
+                self.update_density(stream, club_id, club.received,
+                                    last_updated[club_id], final_bookmark)
+
+            # the club's last page has usually moved the bookmark there already,
+            # and writing it again would only repeat the same STATE message
+            with self.output_lock:
+                bookmarked = stream.is_bookmarked(final_bookmark.isoformat(), club_id)
+            if density_changed or not bookmarked:
+                self.update_bookmark(stream, final_bookmark, club_id)
 
     def call_full_stream(self, stream):
         """
         Method to call all fully synced streams
         """
-        for club_id in self.client.config['club_ids']:
-            request_config = {
-                'url': self.generate_api_url(stream, club_id),
-                'headers': self.build_headers(),
-                'params': self.build_params(stream),
-                'run': True
-            }
+        def extract(club_id):
+            request_config = self.build_request_config(stream, club_id,
+                                                       self.build_params(stream))
 
             LOGGER.info("Extracting {s} for club {c}".format(s=stream,
                                                              c=club_id))
 
-            self.call_stream(stream, club_id, request_config)
+            return self.request_club_pages(stream, club_id, request_config)
+
+        clubs = self.map_clubs(extract)
+        if not self.change_detection:
+            for _ in self.write_clubs(stream, clubs):
+                pass
+            return
+
+        # a club's pages are only written once all of them are hashed
+        pages = {}
+        for club_id, result in clubs:
+            if result is ITEM_DONE:
+                self.write_changed_pages(stream, club_id, pages.pop(club_id, []))
+            else:
+                pages.setdefault(club_id, []).append(result)
 
-    def call_stream(self, stream, club_id, request_config, curr_upper_bound=None):
+    def write_changed_pages(self, stream, club_id, pages):
         """
-        Utility method shared by incremental and full streams; handles API calls and
-        record writes
+        Writes the club's pages of a full table stream only if their content
+        changed since they were last written, or if that was more than
+        `change_detection_refresh_hours` ago
         """
-        while request_config['run']:
-            res = self.client.make_request(request_config)
+        digest = self.content_digest(stream, pages)
+        with self.output_lock:
+            previous = stream.get_content_hash(club_id) or {}
+
+        if previous.get('hash') == digest and \
+                self.clock.now - parse_datetime(previous['written_at']) < self.refresh_interval:
+            records = sum(page.count for page, _ in pages)
+            LOGGER.info("{s} for club {c} unchanged, skipping {n} records".format(
+                s=stream.stream, c=club_id, n=records))
+            self.client.metrics.counter('unchanged_records', records,
+                                        **self.metric_tags(stream, club_id))
+            return
+
+        self.write_pages(stream, club_id, pages)
+        with self.output_lock:
+            stream.update_content_hash(digest, self.clock.now.isoformat(), club_id)
 
-            if stream.is_incremental:
-                LOGGER.info('Received {n} records on page {i} for club {c}'.format(
-                    n=res.json()['status']['count'],
-                    i=res.json()['request']['page'],
-                    c=club_id
-                ))
+    @staticmethod
+    def content_digest(stream, pages):
+        """
+        Returns:
+            hash of the records of `pages` and of the fields selected for them,
+            so that selecting another field writes the records again
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(sorted(stream.excluded_paths)).encode('utf-8'))
+        for page, _ in pages:
+            for record in page.records:
+                digest.update(json.dumps(record, sort_keys=True, separators=(',', ':'),
+                                         default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def map_clubs(self, extract):
+        """
+        Runs `extract` for every configured club, `club_concurrency` clubs at a time
+        Args:
+            extract (callable): takes a club_id and returns its pages
+        Returns:
+            generator of (club_id, (Page, upper bound)) tuples, each club's pages
+            in order and followed by (club_id, `ITEM_DONE`). Pages of clubs
+            extracted at the same time are interleaved in the order they arrive,
+            so that no club waits for the clubs before it to be written
+        """
+        if self.club_concurrency > 1:
+            # the buffer is shared, so that a club ahead of the writer can use
+            # the room of clubs still waiting on the API
+            return imap_interleaved(extract,
+                                    self.club_ids,
+                                    max_workers=self.club_concurrency,
+                                    buffer_size=self.club_concurrency * CLUB_BUFFER_PAGES)
+        return self.map_clubs_serially(extract)
+
+    def map_clubs_serially(self, extract):
+        for club_id in self.club_ids:
+            pages = extract(club_id)
+            if self.prefetch_pages > 0:
+                # the club's next page is requested while the current one is
+                # transformed and written
+                pages = prefetch(pages, self.prefetch_pages)
+            for page in pages:
+                yield club_id, page
+            yield club_id, ITEM_DONE
+
+    def write_clubs(self, stream, clubs, checkpoint=None):
+        """
+        Writes the pages of `map_clubs` on the calling thread, whichever club
+        they belong to
+        Args:
+            clubs (iterable): (club_id, page) tuples from `map_clubs`
+            checkpoint (callable): called with a club_id and the upper bound of
+                each of its windows once all of the window's pages are written
+        Returns:
+            generator of (club_id, ClubProgress) tuples, as each club's last
+            page is written
+        """
+        progress = {}
+        for club_id, result in clubs:
+            club = progress.get(club_id)
+            if club is None:
+                club = progress[club_id] = ClubProgress(
+                    checkpoint and functools.partial(checkpoint, club_id))
+
+            if result is ITEM_DONE:
+                del progress[club_id]
+                self.finish_pages(stream, club_id, club)
+                yield club_id, club
             else:
-                LOGGER.info('Received {n} records for club {c}'.format(
-                    n=res.json()['status']['count'],
-                    c=club_id
-                ))
+                page, upper_bound = result
+                self.write_page(stream, club_id, page, upper_bound, club)
 
-            records = res.json().get(stream.stream_metadata['response-key'])
-
-            if not records:
-                records = []
-            elif not isinstance(records, list):
-                # subsequent methods are expecting a list
-                records = [records]
+    def request_club_pages(self, stream, club_id, request_config, curr_upper_bound=None):
+        """
+        `request_pages` for a club's pages as consumed by `map_clubs`, decoded
+        while they are written when `stream_json` allows it
+        """
+        # with change detection, a club's records are only written once all of
+        # them are hashed, so they cannot be streamed
+        streaming = self.stream_json and (stream.is_incremental or not self.change_detection)
+        return self.request_pages(stream, club_id, request_config, curr_upper_bound,
+                                  streaming=streaming)
+
+    def request_window_pages(self, stream, club_id, last_updated, in_flight=None,
+                             density=None):
+        """
+        Backfill for 30 day streams: every window up to the present is computed up
+        front and `backfill_concurrency` of them are requested at the same time
+        Args:
+            in_flight (dict): page checkpoint of an interrupted run to resume from
+            density (float): the club's records per day, sizes adaptive windows
+        Returns:
+            generator of (Page, upper bound datetime (str)) tuples,
+            with the pages of each window following those of the previous window
+        """
+        windows = self.get_window_requests(stream, last_updated, in_flight, density)
+
+        LOGGER.info("Backfilling {s} for club {c} from {d} in {n} windows".format(
+            s=stream, c=club_id, d=last_updated, n=len(windows))
+        )
+
+        def extract(window):
+            params, upper_bound = window
+            request_config = self.build_request_config(stream, club_id, params)
+            if self.adaptive_windows and params['page'] == 1:
+                return self.request_split_pages(stream, club_id, request_config,
+                                                upper_bound)
+            return self.request_pages(stream, club_id, request_config, upper_bound,
+                                      follow_windows=False)
+
+        for _, pages in imap_ordered(extract, windows,
+                                     max_workers=self.backfill_concurrency):
+            yield from pages
+
+    def request_pages(self, stream, club_id, request_config, curr_upper_bound=None,
+                      follow_windows=True, streaming=False):
+        """
+        Makes the API calls for one club; safe to run off the main thread
+        Args:
+            follow_windows (bool): for 30 day streams, move on to the next window
+                once the current one is exhausted
+            streaming (bool): decode records one at a time while they are written;
+                the caller must write each page before asking for the next one
+        Returns:
+            generator of (Page, upper bound datetime (str)) tuples, one per page
+        """
+        while request_config['run']:
+            if streaming:
+                res = self.client.make_request(request_config, stream=True)
+                page = stream_page(res.raw,
+                                   stream.stream_metadata['response-key'],
+                                   stream.excluded_paths,
+                                   params=dict(request_config['params']))
+            else:
+                res = self.client.make_request(request_config)
+                with self.client.metrics.timer('page_decode',
+                                               **self.metric_tags(stream, club_id)):
+                    page = parse_page(res.content,
+                                      stream.stream_metadata['response-key'],
+                                      params=dict(request_config['params']))
+                self.log_page(stream, club_id, page)
 
             # for endpoints that do not provide club_id
             if stream.stream in STREAMS_TO_HYDRATE:
-                records = self.hydrate_record_with_club_id(records, club_id)
+                if streaming:
+                    page.records = self.iter_hydrated(page.records, club_id)
+                else:
+                    self.hydrate_record_with_club_id(page.records, club_id)
 
-            transform_write_and_count(stream, records)
+            yield page, curr_upper_bound
 
-            if stream.is_incremental:
-                LOGGER.info('{s} bookmark for club {c} is currently {b}'.format(
-                    s=stream.stream, c=club_id, b=curr_upper_bound)
-                )
+            if streaming:
+                page.exhaust()
+                res.close()
+                self.log_page(stream, club_id, page)
 
             request_config, curr_upper_bound = self.update_for_next_call(
-                int(res.json()['status']['count']),
+                page.count,
                 request_config,
                 stream,
-                curr_upper_bound
+                curr_upper_bound,
+                follow_windows
+            )
+
+    def request_split_pages(self, stream, club_id, request_config, upper_bound):
+        """
+        Pages through one window like `request_pages`, except that once its first
+        page comes back full, the pages after it are requested
+        `backfill_concurrency` at a time instead of one after the other
+        Returns:
+            generator of (Page, upper bound datetime (str)) tuples, in page order
+        """
+        first = self.request_page(stream, club_id, request_config, upper_bound)
+        yield first
+        if first[0].count < PAGE_SIZE:
+            return
+
+        LOGGER.info("Requesting the pages of {s} for club {c} after page {p} "
+                    "{n} at a time".format(s=stream, c=club_id, p=first[0].number,
+                                           n=self.backfill_concurrency))
+        # how many pages there are is only known once one comes back short, so
+        # pages are requested ahead and those after the last page skipped
+        last_page = [math.inf]
+
+        def extract(number):
+            if number > last_page[0]:
+                return []
+            page_config = dict(request_config,
+                               params=dict(request_config['params'], page=number))
+            page = self.request_page(stream, club_id, page_config, upper_bound)
+            if page[0].count < PAGE_SIZE:
+                last_page[0] = min(last_page[0], number)
+            return [page]
+
+        ordered = imap_ordered(extract,
+                               itertools.count(request_config['params']['page'] + 1),
+                               max_workers=self.backfill_concurrency)
+        try:
+            for _, pages in ordered:
+                for page in pages:
+                    yield page
+                    if page[0].count < PAGE_SIZE:
+                        return
+        finally:
+            ordered.close()
+
+    def request_page(self, stream, club_id, request_config, upper_bound):
+        """
+        Returns:
+            (Page, upper bound datetime (str)) tuple of the single page requested
+            with `request_config`
+        """
+        pages = self.request_pages(stream, club_id, request_config, upper_bound,
+                                   follow_windows=False)
+        try:
+            return next(pages)
+        finally:
+            pages.close()
+
+    @staticmethod
+    def log_page(stream, club_id, page):
+        if stream.is_incremental:
+            LOGGER.info('Received {n} records on page {i} for club {c}'.format(
+                n=page.count,
+                i=page.number,
+                c=club_id
+            ))
+        else:
+            LOGGER.info('Received {n} records for club {c}'.format(
+                n=page.count,
+                c=club_id
+            ))
+
+    def write_pages(self, stream, club_id, pages, checkpoint=None):
+        """
+        Writes the records of each of a club's pages, on the calling thread
+        Args:
+            checkpoint (callable): called with the upper bound of each window
+                once all of its pages (and those of every earlier window) are written
+        Returns:
+            upper bound datetime of the last page written
+        """
+        club = ClubProgress(checkpoint)
+        for page, upper_bound in pages:
+            self.write_page(stream, club_id, page, upper_bound, club)
+        return self.finish_pages(stream, club_id, club)
+
+    def write_page(self, stream, club_id, page, upper_bound, club):
+        """
+        Writes the records of one of a club's pages, on the calling thread
+        Args:
+            club (ClubProgress): the club's pages written so far
+        """
+        checkpoint = club.checkpoint
+        if checkpoint and club.upper_bound and upper_bound != club.upper_bound \
+                and club.checkpointed != club.upper_bound:
+            checkpoint(club.upper_bound)
+        club.upper_bound = upper_bound
+
+        tags = self.metric_tags(stream, club_id)
+        dedup = self.dedup.get(stream.stream)
+        page_records = page.records
+        if dedup is not None:
+            page_records = dedup.filter(club_id, page_records)
+
+        with self.output_lock:
+            started = time.perf_counter()
+            club.records += self.record_writer.write_records(stream, page_records)
+            transform_seconds = self.record_writer.transform_seconds
+            self.record_writer.flush()
+            write_seconds = time.perf_counter() - started - transform_seconds
+
+            if checkpoint and upper_bound and page.count < PAGE_SIZE:
+                # the last page of its range, so the whole range is written
+                checkpoint(upper_bound)
+                club.checkpointed = upper_bound
+            elif stream.is_incremental and page.params and 'page' in page.params:
+                # part way through a range: remember the page, so that an
+                # interrupted run can pick up after it
+                stream.update_page_checkpoint(page.params, club_id)
+
+            self.state_writer.records_written(page.count)
+
+        # a streamed page is only counted once it has been written
+        club.received += page.count
+
+        self.client.metrics.timing('page_transform', transform_seconds, **tags)
+        self.client.metrics.timing('page_write', write_seconds, **tags)
+
+        if stream.is_incremental:
+            LOGGER.info('{s} bookmark for club {c} is currently {b}'.format(
+                s=stream.stream, c=club_id, b=club.upper_bound)
             )
 
-        return curr_upper_bound
+    def finish_pages(self, stream, club_id, club):
+        """
+        Records the metrics of a club whose pages are all written
+        Returns:
+            upper bound datetime of the last page written
+        """
+        tags = self.metric_tags(stream, club_id)
+        self.client.metrics.counter('club_records', club.records, **tags)
+        dedup = self.dedup.get(stream.stream)
+        if dedup is not None:
+            self.client.metrics.counter('duplicate_records',
+                                        dedup.dropped.pop(club_id, 0), **tags)
+        return club.upper_bound
+
+    def update_bookmark(self, stream, last_updated, club_id):
+        """
+        Args:
+            last_updated (datetime): upper bound of the last range written
+        """
+        with self.output_lock:
+            if stream.stream in self.dedup:
+                stream.update_dedup_boundary(self.dedup[stream.stream].boundary(club_id),
+                                             club_id)
+            stream.update_bookmark(last_updated.isoformat(), club_id)
+
+    def update_density(self, stream, club_id, records, last_updated, final_bookmark):
+        """
+        Folds the records per day of the range just synced into the club's density
+        Returns:
+            whether the density was updated
+        """
+        days = (final_bookmark - last_updated).total_seconds() / 86400
+        if days < MIN_WINDOW.total_seconds() / 86400:
+            # too short a range to say anything about the club
+            return False
+
+        with self.output_lock:
+            previous = stream.get_density(club_id)
+            density = records / days
+            if previous is not None:
+                density = (previous + density) / 2
+            stream.update_density(density, club_id)
+        return True
+
+    def build_request_config(self, stream, club_id, params):
+        """
+        Returns:
+            request_config (dict) for the first page requested with `params`; its
+            `tags` label the request's metrics
+        """
+        return {
+            'url': self.generate_api_url(stream, club_id),
+            'headers': self.build_headers(),
+            'params': params,
+            'tags': self.metric_tags(stream, club_id),
+            'run': True
+        }
+
+    @staticmethod
+    def metric_tags(stream, club_id):
+        return {
+            'stream': stream.stream,
+            'club_id': club_id,
+            'endpoint': stream.stream_metadata['api-path'],
+        }
 
     def generate_api_url(self, stream, club_id):
         return self.url + club_id + stream.stream_metadata['api-path']
@@ -155,56 +662,141 @@ class ABCExecutor(TapExecutor):
             "app_key": self.api_key,
         }
 
-    @staticmethod
-    def get_new_bookmark(stream, last_updated):
+    def get_new_bookmark(self, stream, last_updated):
+        """
+        Args:
+            last_updated (datetime)
+        Returns:
+            datetime the window starting at `last_updated` ends at
+        """
         # some streams (checkins, events) only extract in 30 day windows, so
         # `new_bookmark` needs to account for that
-        if stream.stream in ('checkins', 'events'):
-            last_updated = pendulum.parse(last_updated)
-            # for checkins, API does not appear to return any records < 7 hours old
-            # add 12 hour delay, so we're not requesting records that are not yet available
-            upper_bound = pendulum.now('UTC').subtract(hours=12)
-            new_bookmark = min(last_updated.add(days=30), upper_bound)
-        else:
-            new_bookmark = str(pendulum.now('UTC'))
+        sync_end = self.clock.sync_end(stream.stream)
+        if stream.stream in THIRTY_DAY_STREAMS:
+            return min(last_updated + MAX_WINDOW, sync_end)
+        return sync_end
 
-        return str(new_bookmark)
+    def get_backfill_windows(self, stream, last_updated):
+        """
+        Returns:
+            array of Windows, the same windows `get_next_config_for_30day_streams`
+            would walk one at a time
+        """
+        windows = []
+        while True:
+            new_bookmark = self.get_new_bookmark(stream, last_updated)
+            windows.append(Window(last_updated, new_bookmark))
+            if new_bookmark >= self.clock.window_cutoff:
+                return windows
+            last_updated = new_bookmark
 
-    @staticmethod
-    def format_last_updated(last_updated):
+    def get_window_size(self, stream, density):
         """
         Args:
-            last_updated(str): datetime string in ISO 8601 format
+            density (float): the club's records per day, None if not known yet
         Returns:
-            datetime string in the following format: 'YYYY-MM-DD hh:mm:ss.nnnnnn'
-            (necessary format for ABC Financial API)
+            timedelta expected to hold `window_target_records` records, None for
+            a single window up to the present
         """
-        datetime = pendulum.parse(last_updated).to_datetime_string() + '.000000'
-        return datetime
+        max_size = MAX_WINDOW if stream.stream in THIRTY_DAY_STREAMS else None
+        if not density:
+            return max_size
 
-    def build_initial_params(self, stream, last_updated, new_bookmark):
-        date_range = '{p},{c}'.format(p=self.format_last_updated(last_updated),
-                                      c=self.format_last_updated(new_bookmark))
+        size = pendulum.Interval(days=self.window_target_records / density)
+        if max_size is not None:
+            size = min(size, max_size)
+        return max(size, MIN_WINDOW)
+
+    def get_adaptive_windows(self, stream, last_updated, density):
+        """
+        Returns:
+            array of Windows sized by `get_window_size`, the last one ending at
+            the run clock's sync end
+        """
+        size = self.get_window_size(stream, density)
+        sync_end = self.clock.sync_end(stream.stream)
+        lower_bound = last_updated
+        windows = []
+        while True:
+            upper_bound = sync_end if size is None else min(lower_bound + size, sync_end)
+            windows.append(Window(lower_bound, upper_bound))
+            if upper_bound >= sync_end:
+                return windows
+            lower_bound = upper_bound
+
+    def get_window_requests(self, stream, last_updated, in_flight=None, density=None):
+        """
+        Args:
+            last_updated (datetime)
+            in_flight (dict): page checkpoint of an interrupted run; its window is
+                resumed first and the remaining windows start where it ends
+            density (float): the club's records per day, for adaptive windows
+        Returns:
+            array of (params (dict), upper bound datetime) tuples, one per window
+        """
+        requests = []
+        if in_flight:
+            params, last_updated = self.build_resume_params(stream, in_flight)
+            requests.append((params, last_updated))
+            if self.adaptive_windows:
+                if last_updated >= self.clock.sync_end(stream.stream):
+                    return requests
+            elif last_updated >= self.clock.window_cutoff:
+                return requests
+
+        if self.adaptive_windows:
+            windows = self.get_adaptive_windows(stream, last_updated, density)
+        else:
+            windows = self.get_backfill_windows(stream, last_updated)
+
+        for window in windows:
+            requests.append((self.build_initial_params(stream, window), window.upper))
+        return requests
+
+    @staticmethod
+    def build_initial_params(stream, window):
         return {
-            stream.stream_metadata['incremental-search-key']: date_range,
+            stream.stream_metadata['incremental-search-key']: window.to_param(),
             'page': 1
         }
 
+    @classmethod
+    def build_resume_params(cls, stream, in_flight):
+        """
+        Args:
+            in_flight (dict): page checkpoint written by `update_page_checkpoint`
+        Returns:
+            tuple (params (dict) for the page after the checkpoint,
+                   upper bound datetime of the checkpointed range)
+        """
+        params = {
+            stream.stream_metadata['incremental-search-key']: in_flight['range'],
+            'page': in_flight['page'] + 1
+        }
+        return params, cls.parse_range(stream, params).upper
+
+    @staticmethod
+    def parse_range(stream, params):
+        """
+        Returns:
+            Window of the range in `params`
+        """
+        return Window.parse(params[stream.stream_metadata['incremental-search-key']])
+
     def update_for_next_call(self, num_records_received, request_config,
-                             stream, last_updated=None):
+                             stream, last_updated=None, follow_windows=True):
         """
         We return `last_updated` so that it can be easily referenced in other functions
         without having to string-parse the time range provided in the request config
         Returns:
-            tuple (request_config (dict), last_updated datetime (str))
+            tuple (request_config (dict), last_updated datetime)
         """
-        if num_records_received < 5000:
+        if num_records_received < PAGE_SIZE:
             # some streams (checkins, events) only extract in 30 day increments,
             # we don't want them to stop until they've reached the present day.
             # therefore, we need to handle them differently than "normal" streams
-            cutoff_dt = pendulum.now('UTC').subtract(hours=12).start_of('day')
-            if stream.stream in ('checkins', 'events') and \
-                    pendulum.parse(last_updated) < cutoff_dt:
+            if follow_windows and stream.stream in THIRTY_DAY_STREAMS and \
+                    last_updated < self.clock.window_cutoff:
                 return self.get_next_config_for_30day_streams(stream,
                                                               last_updated,
                                                               request_config)
@@ -215,6 +807,7 @@ class ABCExecutor(TapExecutor):
             new_config = {"url": request_config['url'],
                           "headers": request_config['headers'],
                           "params": self.build_next_params(request_config['params']),
+                          "tags": request_config.get('tags', {}),
                           "run": True}
             return new_config, last_updated
 
@@ -227,13 +820,14 @@ class ABCExecutor(TapExecutor):
     def get_next_config_for_30day_streams(self, stream, last_updated, request_config):
         """
         Returns:
-             tuple (request_config (dict), last_updated datetime (str))
+             tuple (request_config (dict), last_updated datetime)
         """
         new_bookmark = self.get_new_bookmark(stream, last_updated)
         new_config = {
             "url": request_config['url'],
             "headers": request_config['headers'],
-            "params": self.build_initial_params(stream, last_updated, new_bookmark),
+            "params": self.build_initial_params(stream, Window(last_updated, new_bookmark)),
+            "tags": request_config.get('tags', {}),
             "run": True
         }
         return new_config, new_bookmark
@@ -252,5 +846,50 @@ class ABCExecutor(TapExecutor):
 
         return records
 
+    @staticmethod
+    def iter_hydrated(records, club_id):
+        """
+        Lazy counterpart of `hydrate_record_with_club_id`, for streamed pages
+        """
+        for record in records:
+            record['club_id'] = club_id
+            yield record
+
 
 STREAMS_TO_HYDRATE = {'prospects', 'clubs', 'checkins', 'events'}
+
+# records per page of every paged endpoint
+PAGE_SIZE = 5000
+
+# pages buffered per club extracted at the same time, see `map_clubs`
+CLUB_BUFFER_PAGES = 2
+
+# bounds for windows sized by `adaptive_windows`; the API serves at most 30
+# days of the 30 day streams at a time
+MIN_WINDOW = pendulum.Interval(hours=1)
+MAX_WINDOW = pendulum.Interval(days=30)
+DEFAULT_WINDOW_TARGET_RECORDS = PAGE_SIZE // 2
+
+# with `change_detection`, unchanged records of full table streams are still
+# written once this long after they last were
+DEFAULT_REFRESH_INTERVAL_HOURS = 24 * 7
+
+
+class ClubProgress:
+    """
+    How far the writing of one club's pages of a stream has got
+    """
+
+    def __init__(self, checkpoint=None):
+        """
+        Args:
+            checkpoint (callable): called with the upper bound of each window
+                once all of its pages are written
+        """
+        self.checkpoint = checkpoint
+        # records written, after any duplicates were dropped
+        self.records = 0
+        # records received from the API
+        self.received = 0
+        self.upper_bound = None
+        self.checkpointed = None
@@ -0,0 +1,163 @@
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import singer
+from singer.metrics import Point, log as log_point
+
+LOGGER = singer.get_logger()
+
+DEFAULT_PREFIX = 'tap_abcfinancial'
+
+# seconds between rewrites of the Prometheus textfile
+TEXTFILE_INTERVAL = 10
+
+
+class Metrics:
+    """
+    Structured metrics, tagged by stream, club_id and endpoint. Every point is
+    logged as a Singer metric and handed to the configured sinks.
+    """
+
+    def __init__(self, sinks=None):
+        self.sinks = sinks or []
+
+    def counter(self, metric, value=1, **tags):
+        self.emit('counter', metric, value, tags)
+
+    def timing(self, metric, seconds, **tags):
+        self.emit('timer', metric, seconds, tags)
+
+    @contextmanager
+    def timer(self, metric, **tags):
+        """
+        Times the block; the yielded tags can still be added to inside it, and
+        `status` is set unless the block sets it
+        """
+        started = time.perf_counter()
+        try:
+            yield tags
+        except Exception:
+            tags.setdefault('status', 'failed')
+            raise
+        else:
+            tags.setdefault('status', 'succeeded')
+        finally:
+            self.timing(metric, time.perf_counter() - started, **tags)
+
+    def emit(self, metric_type, metric, value, tags):
+        tags = {key: tag for key, tag in tags.items() if tag is not None}
+        log_point(LOGGER, Point(metric_type, metric, value, tags))
+        for sink in self.sinks:
+            try:
+                sink.emit(metric_type, metric, value, tags)
+            except Exception as exc:  # metrics must never fail a sync
+                LOGGER.warning('Dropping metric {m}: {e}'.format(m=metric, e=exc))
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+class StatsdSink:
+    """
+    Sends points over UDP in the StatsD line format, with DogStatsD style tags
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix=DEFAULT_PREFIX):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, metric_type, metric, value, tags):
+        if metric_type == 'timer':
+            line = '{p}.{m}:{v:.3f}|ms'.format(p=self.prefix, m=metric, v=value * 1000)
+        else:
+            line = '{p}.{m}:{v}|c'.format(p=self.prefix, m=metric, v=value)
+        if tags:
+            line += '|#' + ','.join('{}:{}'.format(k, v) for k, v in sorted(tags.items()))
+        self.socket.sendto(line.encode('utf-8'), self.address)
+
+    def flush(self):
+        pass
+
+
+class PrometheusTextfileSink:
+    """
+    Aggregates points in memory and writes them to a file in the Prometheus
+    text format, for the node_exporter textfile collector. Counters become
+    `<metric>_total`, timers `<metric>_seconds_sum` and `<metric>_seconds_count`.
+    """
+
+    def __init__(self, path, prefix=DEFAULT_PREFIX, interval=TEXTFILE_INTERVAL):
+        self.path = path
+        self.prefix = prefix
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+        self.written_at = time.monotonic()
+
+    def emit(self, metric_type, metric, value, tags):
+        key = (metric, tuple(sorted((k, str(v)) for k, v in tags.items())))
+        with self.lock:
+            if metric_type == 'timer':
+                total, count = self.timers.get(key, (0.0, 0))
+                self.timers[key] = (total + value, count + 1)
+            else:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+        if time.monotonic() - self.written_at >= self.interval:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            lines = []
+            for (metric, tags), value in sorted(self.counters.items()):
+                lines.append(self._line(metric + '_total', tags, value))
+            for (metric, tags), (total, count) in sorted(self.timers.items()):
+                lines.append(self._line(metric + '_seconds_sum', tags, total))
+                lines.append(self._line(metric + '_seconds_count', tags, count))
+
+            # written whole and renamed, so the collector never reads half a file
+            partial = self.path + '.tmp'
+            with open(partial, 'w') as textfile:
+                textfile.write('\n'.join(lines) + '\n')
+            os.replace(partial, self.path)
+            self.written_at = time.monotonic()
+
+    def _line(self, name, tags, value):
+        labels = ','.join('{}="{}"'.format(_metric_name(k), _escape(v)) for k, v in tags)
+        return '{n}{{{l}}} {v}'.format(n=_metric_name(self.prefix + '_' + name),
+                                       l=labels,
+                                       v=value)
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def build_metrics(config):
+    """
+    Returns:
+        Metrics with the sinks named by the `metrics_statsd` ("host:port") and
+        `metrics_prometheus_textfile` (path) config options
+    """
+    prefix = config.get('metrics_prefix', DEFAULT_PREFIX)
+    sinks = []
+
+    if config.get('metrics_statsd'):
+        host, _, port = config['metrics_statsd'].partition(':')
+        sinks.append(StatsdSink(host or '127.0.0.1', port or 8125, prefix))
+
+    if config.get('metrics_prometheus_textfile'):
+        sinks.append(PrometheusTextfileSink(config['metrics_prometheus_textfile'], prefix))
+
+    return Metrics(sinks)
@@ -0,0 +1,78 @@
+import sys
+import time
+
+import singer
+
+# bytes of serialized RECORD messages held before they are written
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+class RecordWriter:
+    """
+    Buffers serialized RECORD messages and writes them to stdout in bulk. The
+    lines are exactly those `singer.write_record` would have written, only with
+    fewer writes and flushes.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, out=None):
+        """
+        Args:
+            buffer_size (int): bytes buffered before writing, 0 to write every
+                record straight away
+            out (file-like): defaults to the current `sys.stdout`
+        """
+        self.buffer_size = buffer_size
+        self.out = out
+        self.lines = []
+        self.size = 0
+        # seconds the last `write_records` spent transforming
+        self.transform_seconds = 0.0
+
+    def write_records(self, stream, records):
+        """
+        Transforms `records` with the stream's transform (which drops
+        unselected fields) and buffers them
+        Returns:
+            number of records written
+        """
+        transform = stream.transform
+        write = self.write
+        name = stream.stream
+        clock = time.perf_counter
+
+        count = 0
+        transform_seconds = 0.0
+        with singer.metrics.record_counter(name) as counter:
+            for record in records:
+                started = clock()
+                transformed = transform(record)
+                transform_seconds += clock() - started
+                write(name, transformed)
+                counter.increment()
+                count += 1
+
+        self.transform_seconds = transform_seconds
+        # the counter resets its value when it exits
+        return count
+
+    def write(self, stream_name, record):
+        line = singer.format_message(
+            singer.RecordMessage(stream=stream_name, record=record)
+        )
+        self.lines.append(line)
+        self.size += len(line)
+
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+
+        out = self.out or sys.stdout
+        self.lines.append('')
+        out.write('\n'.join(self.lines))
+        out.flush()
+
+        self.lines = []
+        self.size = 0
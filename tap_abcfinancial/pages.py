@@ -0,0 +1,156 @@
+from collections import namedtuple
+
+try:
+    import orjson as _json
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    import json as _json
+    JSON_BACKEND = 'json'
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class Page(namedtuple('Page', ['count', 'number', 'records', 'params'])):
+    """
+    One decoded API response
+    Attributes:
+        count (int): number of records the API reports for the page
+        number (int): page number the API reports, None for unpaged endpoints
+        records (array [JSON]): the records under the stream's `response-key`
+        params (dict): the request params the page answered
+    """
+    __slots__ = ()
+
+
+def loads(body):
+    """
+    Args:
+        body (bytes or str): raw JSON document
+    Returns:
+        the decoded document, using orjson when it is installed
+    """
+    return _json.loads(body)
+
+
+def parse_page(body, response_key, params=None):
+    """
+    Decodes a response body exactly once
+    Args:
+        body (bytes or str): raw response body
+        response_key (str): key holding the records in the response
+        params (dict): the request params the body answered
+    Returns:
+        Page
+    """
+    content = loads(body)
+
+    records = content.get(response_key)
+    if not records:
+        records = []
+    elif not isinstance(records, list):
+        # subsequent methods are expecting a list
+        records = [records]
+
+    number = content.get('request', {}).get('page')
+
+    return Page(count=int(content['status']['count']),
+                number=int(number) if number is not None else None,
+                records=records,
+                params=params)
+
+
+class StreamedPage:
+    """
+    API response whose records are decoded one at a time while they are read
+    from the socket, so that a full page is never held in memory. Fields the
+    catalog leaves out are skipped over without ever being built. `count` and
+    `number` are only reliable once `records` has been exhausted.
+    """
+
+    def __init__(self, fileobj, response_key, excluded=None, params=None):
+        """
+        Args:
+            excluded (set): paths of fields to skip, see `transform.excluded_paths`
+            params (dict): the request params the body answers
+        """
+        self.count = None
+        self.number = None
+        self.params = params
+        self.records = self._decode(fileobj, response_key, excluded or ())
+
+    def _decode(self, fileobj, response_key, excluded):
+        item_prefix = response_key + '.item'
+        # ijson names a field by its parent's prefix plus its key; records are
+        # either elements of an array or, for single records, the object itself
+        skipped = {base + '.' + '.'.join(path)
+                   for base in (item_prefix, response_key)
+                   for path in excluded}
+        builder = None
+        target = None
+        skipping = None
+        skipping_container = False
+        counted = 0
+
+        for prefix, event, value in ijson.parse(fileobj, use_float=True):
+            if skipping is not None:
+                # drop every event of the skipped value, which is either a
+                # single scalar event or everything up to its closing event
+                if prefix == skipping:
+                    if event in ('start_map', 'start_array'):
+                        skipping_container = True
+                    elif not skipping_container or event in ('end_map', 'end_array'):
+                        skipping = None
+                continue
+
+            if builder is not None:
+                if event == 'map_key' and skipped and \
+                        prefix + '.' + value in skipped:
+                    skipping = prefix + '.' + value
+                    skipping_container = False
+                    continue
+
+                builder.event(event, value)
+                if prefix == target and event in ('end_map', 'end_array'):
+                    counted += 1
+                    yield builder.value
+                    builder = None
+            elif event in ('start_map', 'start_array') and prefix == item_prefix or \
+                    event == 'start_map' and prefix == response_key:
+                # either an element of the records array, or a lone record
+                # (e.g. `club`), which subsequent methods treat as a list of one
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                target = prefix
+            elif prefix == 'status.count':
+                self.count = int(value)
+            elif prefix == 'request.page':
+                self.number = int(value)
+
+        if self.count is None:
+            self.count = counted
+
+    def exhaust(self):
+        """
+        Reads whatever the consumer left of the body, so that `count` is known
+        """
+        for _ in self.records:
+            pass
+        return self
+
+
+def stream_page(fileobj, response_key, excluded=None, params=None):
+    """
+    Args:
+        fileobj (file-like): raw, undecoded response body
+        response_key (str): key holding the records in the response
+        excluded (set): paths of fields to skip while decoding
+        params (dict): the request params the body answers
+    Returns:
+        StreamedPage
+    """
+    if ijson is None:
+        raise RuntimeError("Streaming decoding requires the `ijson` package")
+    return StreamedPage(fileobj, response_key, excluded, params)
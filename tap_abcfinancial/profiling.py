@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import singer
+
+LOGGER = singer.get_logger()
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOP = 25
+
+# samples of threads not working on any stream at the time
+OTHER = '_other'
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler. Every `interval` seconds the stack of every
+    thread is recorded and attributed to the stream its innermost `labelled`
+    frame is working on, so worker threads are profiled along with the thread
+    writing the stream. Blocked threads are sampled too: time spent waiting on
+    the network or a queue shows up under the waiting frame.
+    """
+
+    def __init__(self, labelled, interval=DEFAULT_INTERVAL):
+        """
+        Args:
+            labelled (set): code objects whose `stream` local names the stream
+                a sample belongs to
+            interval (float): seconds between samples
+        """
+        self.labelled = labelled
+        self.interval = interval
+        # stream -> Counter of stacks (tuples of code objects, outermost first)
+        self.stacks = defaultdict(Counter)
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='abc-profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.sample(frame)
+
+    def sample(self, frame):
+        stack = []
+        label = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append(code)
+            if label is None and code in self.labelled:
+                label = getattr(frame.f_locals.get('stream'), 'stream', None)
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[label or OTHER][tuple(stack)] += 1
+
+    def write(self, directory, top=DEFAULT_TOP):
+        """
+        Writes `<stream>.collapsed` per stream, in the collapsed stack format
+        read by flamegraph.pl and speedscope, and `summary.txt` with each
+        stream's hottest functions
+        Returns:
+            path of the summary
+        """
+        os.makedirs(directory, exist_ok=True)
+        summary = []
+
+        for label, stacks in sorted(self.stacks.items()):
+            with open(os.path.join(directory, label + '.collapsed'), 'w') as collapsed:
+                for stack, count in stacks.most_common():
+                    collapsed.write('{} {}\n'.format(';'.join(map(frame_name, stack)),
+                                                     count))
+            summary.extend(summarize(label, stacks, top))
+
+        path = os.path.join(directory, 'summary.txt')
+        with open(path, 'w') as summary_file:
+            summary_file.write('\n'.join(summary) + '\n')
+        return path
+
+
+def summarize(label, stacks, top):
+    """
+    Returns:
+        array of lines: the `top` functions by samples spent in the function
+        itself (self) and anywhere beneath it (total)
+    """
+    samples = sum(stacks.values())
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for code in set(stack):
+            total[code] += count
+
+    lines = ['{} ({} samples)'.format(label, samples),
+             '  {:>7} {:>7}  function'.format('self%', 'total%')]
+    for code, count in own.most_common(top):
+        lines.append('  {:>7.1%} {:>7.1%}  {}'.format(count / samples,
+                                                      total[code] / samples,
+                                                      frame_name(code)))
+    lines.append('')
+    return lines
+
+
+def frame_name(code):
+    name = '{} ({}:{})'.format(code.co_name,
+                               os.path.basename(code.co_filename),
+                               code.co_firstlineno)
+    # ';' separates frames in collapsed stacks
+    return name.replace(';', ':')
+
+
+@contextmanager
+def profiled(config, executor_cls):
+    """
+    Samples the block when the `profile_dir` config option is set, and writes
+    the profiles there once it exits, whether or not it raised
+    """
+    directory = config.get('profile_dir')
+    if not directory:
+        yield
+        return
+
+    profiler = SamplingProfiler(labelled_code(executor_cls),
+                                float(config.get('profile_interval', DEFAULT_INTERVAL)))
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        path = profiler.write(directory, int(config.get('profile_top', DEFAULT_TOP)))
+        with open(path) as summary:
+            LOGGER.info('Profiles written to {d}\n{s}'.format(d=directory, s=summary.read()))
+
+
+def labelled_code(cls):
+    """
+    Returns:
+        code objects of the methods of `cls` taking a `stream` argument
+    """
+    codes = set()
+    for klass in cls.__mro__:
+        for attribute in vars(klass).values():
+            func = getattr(attribute, '__func__', attribute)
+            code = getattr(func, '__code__', None)
+            if code is not None and 'stream' in code.co_varnames[:code.co_argcount]:
+                codes.add(code)
+    return codes
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# pause applied when the API throttles us without saying for how long
+DEFAULT_THROTTLE_PAUSE = 1.0
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every worker of a client. The allowed rate is learnt
+    from the API: it is halved on every 429 and grows back slowly while requests
+    succeed, capped by whatever the rate limit headers advertise.
+    """
+
+    def __init__(self, max_rate=None, min_rate=0.1, increase=1.0):
+        """
+        Args:
+            max_rate (float): requests per second never exceeded, None for no cap
+            min_rate (float): floor the rate is never throttled below
+            increase (float): requests per second regained per second of success
+        """
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+
+        # None until the first throttle (or `max_rate`) gives us a rate
+        self.rate = max_rate
+        self.header_rate = None
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.sent = deque(maxlen=50)
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Claims the next request slot
+        Returns:
+            seconds (float) the caller has to wait before sending its request
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, 0.0)
+
+            rate = self._current_rate()
+            if rate is not None:
+                self.tokens = min(1.0, self.tokens + (now - self.updated) * rate)
+                self.updated = now
+                # the bucket may go negative, which queues later callers
+                # behind this one instead of letting them all through at once
+                self.tokens -= 1.0
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / rate)
+
+            self.sent.append(now + wait)
+            return wait
+
+    def acquire(self):
+        """
+        Blocks until the caller may send its request
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self, headers=None):
+        with self.lock:
+            if headers:
+                self._read_headers(headers)
+            if self.rate is not None:
+                # additive increase, roughly `increase` req/sec every second
+                self.rate = self.rate + self.increase / max(self.rate, self.min_rate)
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+    def on_throttled(self, headers=None):
+        """
+        Slows every worker down after a 429
+        Returns:
+            seconds (float) all workers are paused for
+        """
+        with self.lock:
+            now = time.monotonic()
+            if headers:
+                self._read_headers(headers)
+
+            # multiplicative decrease, starting from the rate we were actually
+            # sending at when no rate has been learnt yet. 429s for requests
+            # that were already in flight during a pause only count once
+            if now >= self.paused_until:
+                rate = self.rate if self.rate is not None else self._observed_rate(now)
+                self.rate = max(rate / 2.0, self.min_rate)
+            self.tokens = min(self.tokens, 0.0)
+
+            pause = parse_retry_after(headers) if headers else None
+            if pause is None:
+                pause = DEFAULT_THROTTLE_PAUSE
+            self.paused_until = max(self.paused_until, now + pause)
+
+            LOGGER.warning("Throttled by the API, pausing {p:.1f}s and slowing "
+                           "to {r:.2f} requests/sec".format(p=pause, r=self.rate))
+            return pause
+
+    def pause(self, seconds):
+        """
+        Holds every worker back for `seconds`, e.g. for a 503's `Retry-After`
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _current_rate(self):
+        rates = [r for r in (self.rate, self.header_rate) if r is not None]
+        return min(rates) if rates else None
+
+    def _observed_rate(self, now):
+        if len(self.sent) < 2 or now <= self.sent[0]:
+            return self.min_rate
+        # measured over at least a second, so a burst does not look endless
+        return len(self.sent) / max(now - self.sent[0], 1.0)
+
+    def _read_headers(self, headers):
+        remaining = _header_number(headers, 'X-RateLimit-Remaining')
+        reset = _header_number(headers, 'X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        if reset > 1e9:
+            # an epoch timestamp rather than a number of seconds
+            reset = max(reset - time.time(), 0.0)
+
+        # spread what is left of the allowance over the rest of the window
+        self.header_rate = max(remaining / max(reset, 1.0), self.min_rate)
+        if remaining <= 0:
+            self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+
+def parse_retry_after(headers):
+    """
+    Returns:
+        seconds (float) requested by a `Retry-After` header, either as a number
+        of seconds or as an HTTP date; None if absent or unreadable
+    """
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
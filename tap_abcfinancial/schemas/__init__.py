@@ -0,0 +1,26 @@
+import json
+import os
+from functools import lru_cache
+
+SCHEMA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def load_schema(stream):
+    """
+    Returns:
+        the JSON schema of `stream`, read from `<stream>.json` the first time
+        it is asked for
+    """
+    with open(os.path.join(SCHEMA_DIR, stream + '.json')) as schema_file:
+        return json.load(schema_file)
+
+
+class StreamSchema:
+    """
+    Class attribute that loads the schema of the class' `stream` when it is
+    first read, so that streams that are not synced never parse theirs
+    """
+
+    def __get__(self, instance, owner):
+        return load_schema(owner.stream)
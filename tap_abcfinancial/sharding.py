@@ -0,0 +1,117 @@
+"""
+Splits `club_ids` between several tap processes, and merges the states they
+write back into one.
+
+    tap-abcfinancial-merge-state shard-0.json shard-1.json -o state.json
+"""
+import argparse
+import json
+import sys
+import zlib
+
+import pendulum
+
+from .state import STATE_FORMATS, compact_state, expand_state
+
+
+def shard_club_ids(club_ids, shard_index=0, shard_count=1):
+    """
+    A club belongs to the shard the CRC32 of its id falls in, so every process
+    agrees on the split whatever order it lists the clubs in
+    Args:
+        club_ids (arr[str])
+        shard_index (int): this process' shard, from 0
+        shard_count (int)
+    Returns:
+        the clubs of `club_ids` in the shard, in `club_ids` order
+    """
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError("`shard_index` must be between 0 and `shard_count` - 1, "
+                         "got {i} of {c}".format(i=shard_index, c=shard_count))
+
+    return [club_id for club_id in club_ids
+            if shard_of(club_id, shard_count) == shard_index]
+
+
+def shard_of(club_id, shard_count):
+    return zlib.crc32(str(club_id).encode('utf-8')) % shard_count
+
+
+def prune_bookmarks(state, club_ids):
+    """
+    Removes the bookmarks of clubs other than `club_ids` from the state
+    Returns:
+        whether any bookmark was removed
+    """
+    keep = set(club_ids)
+    pruned = False
+    for bookmarks in state.get('bookmarks', {}).values():
+        for club_id in list(bookmarks):
+            if club_id not in keep:
+                del bookmarks[club_id]
+                pruned = True
+    return pruned
+
+
+def merge_states(states):
+    """
+    Args:
+        states (arr[dict]): states of the shards of one sync, in any of
+            `STATE_FORMATS`
+    Returns:
+        a state holding every shard's bookmarks. A club found in more than one
+        state keeps the bookmark with the latest replication value; other keys
+        are taken from the first state that has them
+    """
+    merged = {'bookmarks': {}}
+    for state in states:
+        state = dict(state)
+        expand_state(state)
+        for key, value in state.items():
+            if key != 'bookmarks':
+                merged.setdefault(key, value)
+
+        for stream, bookmarks in state.get('bookmarks', {}).items():
+            stream_bookmarks = merged['bookmarks'].setdefault(stream, {})
+            for club_id, bookmark in bookmarks.items():
+                current = stream_bookmarks.get(club_id)
+                if current is None or _bookmark_value(bookmark) > _bookmark_value(current):
+                    stream_bookmarks[club_id] = bookmark
+    return merged
+
+
+def _bookmark_value(bookmark):
+    last_updated = bookmark.get('last_updated')
+    if last_updated is None:
+        return pendulum.from_timestamp(0)
+    return pendulum.parse(last_updated)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='tap-abcfinancial-merge-state',
+                                     description='Merges the states of sharded syncs')
+    parser.add_argument('states', nargs='+', help='state files written by the shards')
+    parser.add_argument('-o', '--output', help='file to write the merged state to '
+                                               '(default stdout)')
+    parser.add_argument('--state-format', choices=STATE_FORMATS, default='nested',
+                        help='layout of the merged state (default nested)')
+    args = parser.parse_args(argv)
+
+    states = []
+    for path in args.states:
+        with open(path) as state_file:
+            states.append(json.load(state_file))
+
+    merged = merge_states(states)
+    if args.state_format != 'nested':
+        merged = compact_state(merged, compress=args.state_format == 'compressed')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(merged, output, indent=2)
+    else:
+        json.dump(merged, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
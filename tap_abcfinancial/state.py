@@ -0,0 +1,208 @@
+import base64
+import copy
+import json
+import time
+import zlib
+
+import singer
+
+# layouts STATE messages can be written in. Bookmarks are always kept nested
+# in memory, `bookmarks[stream][club_id][key]`; `compact` stores each distinct
+# bookmark value once, with the clubs of each stream that share it, and
+# `compressed` is `compact` deflated and base64 encoded into a single string
+STATE_FORMATS = ('nested', 'compact', 'compressed')
+COMPACT_KEY = 'compact_bookmarks'
+
+# seconds between STATE messages unless `state_flush_interval` says otherwise
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+class StateWriter:
+    """
+    Coalesces STATE messages. Bookmark changes only mark the state as dirty; it
+    is written once `flush_interval` seconds have passed or `flush_records`
+    records have been written since the last STATE message, and once more when
+    the sync ends. Bookmarks are only ever moved after their records have been
+    written, so a flushed state is never ahead of the records before it.
+    """
+
+    def __init__(self, state, flush_interval=0, flush_records=0, record_writer=None,
+                 state_format='nested'):
+        """
+        Args:
+            state (dict): the state object bookmarks are written to
+            flush_interval (float): seconds between STATE messages, 0 to write
+                every change straight away
+            flush_records (int): records between STATE messages, 0 for no limit
+            record_writer (RecordWriter): buffered records, written out before
+                every STATE message
+            state_format (str): one of `STATE_FORMATS`
+        """
+        if state_format not in STATE_FORMATS:
+            raise ValueError("`state_format` must be one of {f}, got {s}".format(
+                f=', '.join(STATE_FORMATS), s=state_format))
+
+        self.state = state
+        self.record_writer = record_writer
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self.state_format = state_format
+        # `group_bookmarks` of each stream as of the last compact STATE message,
+        # and the streams changed since, None for all of them
+        self.stream_groups = {}
+        self.stale_streams = None
+
+        self.dirty = False
+        self.records = 0
+        self.flushed_at = time.monotonic()
+
+    def changed(self, stream=None):
+        """
+        Called whenever a bookmark is updated
+        Args:
+            stream (str): the stream whose bookmarks changed, None for any
+        """
+        self.dirty = True
+        if stream is None:
+            self.stale_streams = None
+        elif self.stale_streams is not None:
+            self.stale_streams.add(stream)
+        self.maybe_flush()
+
+    def records_written(self, count):
+        self.records += count
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if not self.dirty:
+            return
+
+        if self.flush_interval <= 0 and self.flush_records <= 0 or \
+                self.flush_interval > 0 and \
+                time.monotonic() - self.flushed_at >= self.flush_interval or \
+                0 < self.flush_records <= self.records:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the state if it changed since the last STATE message
+        """
+        if self.dirty:
+            if self.record_writer is not None:
+                self.record_writer.flush()
+            singer.write_state(self.encode())
+            self.dirty = False
+
+        self.records = 0
+        self.flushed_at = time.monotonic()
+
+    def encode(self):
+        """
+        Returns:
+            the state in `state_format`
+        """
+        if self.state_format == 'nested':
+            return self.state
+
+        # only the streams changed since the last STATE message are grouped again
+        bookmarks = self.state.get('bookmarks', {})
+        stale = bookmarks if self.stale_streams is None else self.stale_streams
+        for stream in stale:
+            self.stream_groups[stream] = group_bookmarks(bookmarks.get(stream, {}))
+        self.stale_streams = set()
+
+        return compact_state(self.state, compress=self.state_format == 'compressed',
+                             stream_groups=self.stream_groups)
+
+
+def group_bookmarks(bookmarks):
+    """
+    Args:
+        bookmarks (dict): one stream's bookmarks, by club id
+    Returns:
+        dict of each bookmark key to a dict of its distinct values, each a
+        tuple (value, arr[club_id])
+    """
+    groups = {}
+    for club_id, bookmark in bookmarks.items():
+        for key, value in bookmark.items():
+            if isinstance(value, (dict, list)):
+                value_key = dict, json.dumps(value, sort_keys=True)
+            else:
+                # `1`, `1.0` and `True` are equal, but are told apart by type
+                value_key = type(value), value
+
+            key_groups = groups.setdefault(key, {})
+            group = key_groups.get(value_key)
+            if group is None:
+                key_groups[value_key] = (value, [club_id])
+            else:
+                group[1].append(club_id)
+    return groups
+
+
+def compact_state(state, compress=False, stream_groups=None):
+    """
+    Args:
+        state (dict): state with nested bookmarks
+        compress (bool): deflate the compact bookmarks into a base64 string
+        stream_groups (dict): `group_bookmarks` of each stream, when already known
+    Returns:
+        a copy of the state with its bookmarks under `COMPACT_KEY` instead:
+        `values` lists every distinct bookmark value once, and
+        `streams[stream][key]` holds a `[value, [club_id, ...]]` group for each
+        value of the key, with the value's index in `values`
+    """
+    if stream_groups is None:
+        stream_groups = {stream: group_bookmarks(bookmarks)
+                         for stream, bookmarks in state.get('bookmarks', {}).items()}
+
+    values, value_indexes = [], {}
+    streams = {}
+    for stream, groups in stream_groups.items():
+        streams[stream] = compact_groups = {}
+        for key, key_groups in groups.items():
+            compact_groups[key] = []
+            for value_key, (value, club_ids) in key_groups.items():
+                index = value_indexes.get(value_key)
+                if index is None:
+                    index = value_indexes[value_key] = len(values)
+                    values.append(value)
+                compact_groups[key].append([index, club_ids])
+
+    compact = {'values': values, 'streams': streams}
+    if compress:
+        encoded = json.dumps(compact, separators=(',', ':')).encode('utf-8')
+        compact = base64.b64encode(zlib.compress(encoded)).decode('ascii')
+
+    compacted = {key: value for key, value in state.items() if key != 'bookmarks'}
+    compacted[COMPACT_KEY] = compact
+    return compacted
+
+
+def expand_state(state):
+    """
+    Migrates a state given in any of `STATE_FORMATS` to nested bookmarks, in
+    place. Bookmarks found in both layouts are taken from the compact one
+    Returns:
+        whether the state was compact
+    """
+    compact = state.pop(COMPACT_KEY, None)
+    if compact is None:
+        return False
+
+    if isinstance(compact, str):
+        compact = json.loads(zlib.decompress(base64.b64decode(compact)).decode('utf-8'))
+
+    values = compact['values']
+    bookmarks = state.setdefault('bookmarks', {})
+    for stream, groups in compact['streams'].items():
+        stream_bookmarks = bookmarks.setdefault(stream, {})
+        for key, key_groups in groups.items():
+            for index, club_ids in key_groups:
+                value = values[index]
+                for club_id in club_ids:
+                    # clubs sharing a value must not share a mutable object
+                    stream_bookmarks.setdefault(club_id, {})[key] = \
+                        copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+    return True
@@ -2,6 +2,10 @@ from tap_kit.streams import Stream
 from tap_kit.utils import safe_to_iso8601
 import singer
 
+from .schemas import StreamSchema
+from .state import StateWriter
+from .transform import stream_transform, excluded_paths
+
 LOGGER = singer.get_logger()
 
 
@@ -22,12 +26,16 @@ class ABCStream(Stream):
     methods to track state for each individual ABC Financial club
     """
 
-    def __init__(self, config=None, state=None, catalog=None):
+    def __init__(self, config=None, state=None, catalog=None, state_writer=None):
         super(ABCStream, self).__init__(config, state, catalog)
 
         self.config = config
         self.state = state
         self.catalog = catalog
+        # without a shared writer, every bookmark change is written straight away
+        self.state_writer = state_writer or StateWriter(state)
+        self._transform = None
+        self._excluded_paths = None
         self.api_path = self.api_path if self.api_path else self.stream
 
         self.build_params()
@@ -69,7 +77,92 @@ class ABCStream(Stream):
                             club_id,
                             self.stream_metadata.get('replication-key'),
                             safe_to_iso8601(last_updated))
-        singer.write_state(self.state)
+        # whatever range was in flight for the club ended at the new bookmark
+        self.state['bookmarks'][self.stream][club_id].pop('in_flight', None)
+        self.state_writer.changed(self.stream)
+
+    def is_bookmarked(self, last_updated, club_id):
+        """
+        Returns:
+            whether `update_bookmark` with `last_updated` would change nothing:
+            the club's bookmark is already there, with no range in flight
+        """
+        return self.get_bookmark(club_id) == safe_to_iso8601(last_updated) and \
+            self.get_page_checkpoint(club_id) is None
+
+    def get_density(self, club_id):
+        """
+        Returns:
+            records per day recently seen for the club, or None
+        """
+        return self.state.get('bookmarks', {})\
+                         .get(self.stream, {})\
+                         .get(club_id, {})\
+                         .get('density')
+
+    def update_density(self, density, club_id):
+        # written out with the bookmark that follows it
+        self.write_bookmark(self.state, self.stream, club_id, 'density',
+                            round(density, 3))
+
+    def get_content_hash(self, club_id):
+        """
+        Returns:
+            dict with the hash of the club's records of a full table stream and
+            when they were last written, or None
+        """
+        return self.state.get('bookmarks', {})\
+                         .get(self.stream, {})\
+                         .get(club_id, {})\
+                         .get('content')
+
+    def update_content_hash(self, digest, written_at, club_id):
+        self.write_bookmark(self.state,
+                            self.stream,
+                            club_id,
+                            'content',
+                            {'hash': digest, 'written_at': written_at})
+        self.state_writer.changed(self.stream)
+
+    def get_dedup_boundary(self, club_id):
+        """
+        Returns:
+            digests of the club's latest records written by the last run
+        """
+        return self.state.get('bookmarks', {})\
+                         .get(self.stream, {})\
+                         .get(club_id, {})\
+                         .get('dedup', [])
+
+    def update_dedup_boundary(self, digests, club_id):
+        # written out with the bookmark that follows it
+        self.write_bookmark(self.state, self.stream, club_id, 'dedup', digests)
+        if not digests:
+            self.state['bookmarks'][self.stream][club_id].pop('dedup')
+
+    def get_page_checkpoint(self, club_id):
+        """
+        Returns:
+            dict with the date range (as sent to the API) being extracted for the
+            club and the last page of it that was written, or None
+        """
+        return self.state.get('bookmarks', {})\
+                         .get(self.stream, {})\
+                         .get(club_id, {})\
+                         .get('in_flight')
+
+    def update_page_checkpoint(self, params, club_id):
+        """
+        Records that the page requested with `params` has been written, so that
+        an interrupted extraction can resume from the page after it
+        """
+        self.write_bookmark(self.state,
+                            self.stream,
+                            club_id,
+                            'in_flight',
+                            {'range': params[self.stream_metadata['incremental-search-key']],
+                             'page': params['page']})
+        self.state_writer.changed(self.stream)
 
     def update_start_date_bookmark(self, club_id):
         val = self.get_bookmark(club_id)
@@ -81,6 +174,28 @@ class ABCStream(Stream):
         self.update_start_date_bookmark(club_id)
         return self.get_bookmark(club_id)
 
+    @property
+    def transform(self):
+        """
+        Function that transforms one record against the catalog's schema and
+        field selection; built once per stream
+        """
+        if self._transform is None:
+            self._transform = stream_transform(self.catalog)
+        return self._transform
+
+    @property
+    def excluded_paths(self):
+        """
+        Paths of the fields the catalog leaves out, which are skipped while
+        decoding streamed pages
+        """
+        if self._excluded_paths is None:
+            self._excluded_paths = excluded_paths(
+                singer.metadata.to_map(self.catalog.metadata)
+            )
+        return self._excluded_paths
+
     @property
     def is_incremental(self):
         if self.stream_metadata.get('forced-replication-method') == 'incremental':
@@ -118,240 +233,7 @@ class MembersStream(ABCStream):
         selected_by_default=False
     )
 
-    schema = {
-        "properties": {
-            "memberId": {
-                "type": ["null", "string"]
-            },
-            "personal": {
-                "properties": {
-                    "firstName": {
-                        "type": ["null", "string"]
-                    },
-                    "lastName": {
-                        "type": ["null", "string"]
-                    },
-                    "middleInitial": {
-                        "type": ["null", "string"]
-                    },
-                    "addressLine1": {
-                        "type": ["null", "string"]
-                    },
-                    "addressLine2": {
-                        "type": ["null", "string"]
-                    },
-                    "city": {
-                        "type": ["null", "string"]
-                    },
-                    "state": {
-                        "type": ["null", "string"]
-                    },
-                    "postalCode": {
-                        "type": ["null", "string"]
-                    },
-                    "homeClub": {
-                        "type": ["null", "string"]
-                    },
-                    "countryCode": {
-                        "type": ["null", "string"]
-                    },
-                    "email": {
-                        "type": ["null", "string"]
-                    },
-                    "primaryPhone": {
-                        "type": ["null", "string"]
-                    },
-                    "workPhoneExt": {
-                        "type": ["null", "string"]
-                    },
-                    "emergencyExt": {
-                        "type": ["null", "string"]
-                    },
-                    "barcode": {
-                        "type": ["null", "string"]
-                    },
-                    "birthDate": {
-                        "type": ["null", "string"]
-                    },
-                    "gender": {
-                        "type": ["null", "string"]
-                    },
-                    "isActive": {
-                        "type": ["null", "string"]
-                    },
-                    "memberStatus": {
-                        "type": ["null", "string"]
-                    },
-                    "joinStatus": {
-                        "type": ["null", "string"]
-                    },
-                    "isConvertedProspect": {
-                        "type": ["null", "string"]
-                    },
-                    "hasPhoto": {
-                        "type": ["null", "string"]
-                    },
-                    "memberStatusReason": {
-                        "type": ["null", "string"]
-                    },
-                    "firstCheckInTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    },
-                    "lastCheckInTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    },
-                    "totalCheckInCount": {
-                        "type": ["null", "string"]
-                    },
-                    "createTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    },
-                    "lastModifiedTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    }
-                },
-                "type": ["null", "object"]
-            },
-            "agreement": {
-                "properties": {
-                    "agreementNumber": {
-                        "type": ["null", "string"]
-                    },
-                    "isPrimaryMember": {
-                        "type": ["null", "string"]
-                    },
-                    "isNonMember": {
-                        "type": ["null", "string"]
-                    },
-                    "ordinal": {
-                        "type": ["null", "string"]
-                    },
-                    "salesPersonId": {
-                        "type": ["null", "string"]
-                    },
-                    "salesPersonName": {
-                        "type": ["null", "string"]
-                    },
-                    "salesPersonHomeClub": {
-                        "type": ["null", "string"]
-                    },
-                    "paymentPlan": {
-                        "type": ["null", "string"]
-                    },
-                    "paymentPlanId": {
-                        "type": ["null", "string"]
-                    },
-                    "term": {
-                        "type": ["null", "string"]
-                    },
-                    "paymentFrequency": {
-                        "type": ["null", "string"]
-                    },
-                    "membershipType": {
-                        "type": ["null", "string"]
-                    },
-                    "managedType": {
-                        "type": ["null", "string"]
-                    },
-                    "campaignId": {
-                        "type": ["null", "string"]
-                    },
-                    "campaignName": {
-                        "type": ["null", "string"]
-                    },
-                    "isPastDue": {
-                        "type": ["null", "string"]
-                    },
-                    "renewalType": {
-                        "type": ["null", "string"]
-                    },
-                    "agreementPaymentMethod": {
-                        "type": ["null", "string"]
-                    },
-                    "downPayment": {
-                        "type": ["null", "string"]
-                    },
-                    "nextDueAmount": {
-                        "type": ["null", "string"]
-                    },
-                    "pastDueBalance": {
-                        "type": ["null", "string"]
-                    },
-                    "lateFeeAmount": {
-                        "type": ["null", "string"]
-                    },
-                    "serviceFeeAmount": {
-                        "type": ["null", "string"]
-                    },
-                    "totalPastDueBalance": {
-                        "type": ["null", "string"]
-                    },
-                    "clubAccountPastDueBalance": {
-                        "type": ["null", "string"]
-                    },
-                    "currentQueue": {
-                        "type": ["null", "string"]
-                    },
-                    "queueTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    },
-                    "agreementEntrySource": {
-                        "type": ["null", "string"]
-                    },
-                    "agreementEntrySourceReportName": {
-                        "type": ["null", "string"]
-                    },
-                    "sinceDate": {
-                        "type": ["null", "string"]
-                    },
-                    "beginDate": {
-                        "type": ["null", "string"]
-                    },
-                    "firstPaymentDate": {
-                        "type": ["null", "string"]
-                    },
-                    "signDate": {
-                        "type": ["null", "string"]
-                    },
-                    "nextBillingDate": {
-                        "type": ["null", "string"]
-                    },
-                    "convertedDate": {
-                        "type": ["null", "string"]
-                    },
-                    "expirationDate": {
-                        "type": ["null", "string"]
-                    },
-                    "renewalDate": {
-                        "type": ["null", "string"]
-                    },
-                    "lastRenewalDate": {
-                        "type": ["null", "string"]
-                    },
-                    "lastRewriteDate": {
-                        "type": ["null", "string"]
-                    },
-                    "primaryBillingAccountHolder": {
-                        "properties": {
-                            "firstName": {
-                                "type": ["null", "string"]
-                            },
-                            "lastName": {
-                                "type": ["null", "string"]
-                            }
-                        },
-                        "type": ["null", "object"]
-                    }
-                },
-                "type": ["null", "object"]
-            }
-        }
-    }
+    schema = StreamSchema()
 
 
 class ProspectsStream(ABCStream):
@@ -367,125 +249,7 @@ class ProspectsStream(ABCStream):
         selected_by_default=False
     )
 
-    schema = {
-        "properties": {
-            "prospectId": {
-                "type": ["null", "string"]
-            },
-            "personal": {
-                "properties": {
-                    "firstName": {
-                        "type": ["null", "string"]
-                    },
-                    "lastName": {
-                        "type": ["null", "string"]
-                    },
-                    "city": {
-                        "type": ["null", "string"]
-                    },
-                    "state": {
-                        "type": ["null", "string"]
-                    },
-                    "postalCode": {
-                        "type": ["null", "string"]
-                    },
-                    "countryCode": {
-                        "type": ["null", "string"]
-                    },
-                    "primaryPhone": {
-                        "type": ["null", "string"]
-                    },
-                    "barcode": {
-                        "type": ["null", "string"]
-                    },
-                    "birthDate": {
-                        "type": ["null", "string"]
-                    },
-                    "gender": {
-                        "type": ["null", "string"]
-                    },
-                    "isActive": {
-                        "type": ["null", "string"]
-                    },
-                    "hasPhoto": {
-                        "type": ["null", "string"]
-                    },
-                    "firstCheckInTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    },
-                    "createdTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    },
-                    "lastModifiedTimestamp": {
-                        "type": ["null", "string"],
-                        "format": "date-time"
-                    }
-                },
-                "type": ["null", "object"]
-            },
-            "agreement": {
-                "properties": {
-                    "referringMemberId": {
-                        "type": ["null", "string"]
-                    },
-                    "referringMemberHomeClub": {
-                        "type": ["null", "string"]
-                    },
-                    "referringMemberName": {
-                        "type": ["null", "string"]
-                    },
-                    "salesPersonId": {
-                        "type": ["null", "string"]
-                    },
-                    "salesPersonName": {
-                        "type": ["null", "string"]
-                    },
-                    "salesPersonHomeClub": {
-                        "type": ["null", "string"]
-                    },
-                    "campaignId": {
-                        "type": ["null", "string"]
-                    },
-                    "campaignName": {
-                        "type": ["null", "string"]
-                    },
-                    "campaignGroup": {
-                        "type": ["null", "string"]
-                    },
-                    "agreementEntrySource": {
-                        "type": ["null", "string"]
-                    },
-                    "agreementEntrySourceReportName": {
-                        "type": ["null", "string"]
-                    },
-                    "beginDate": {
-                        "type": ["null", "string"]
-                    },
-                    "expirationDate": {
-                        "type": ["null", "string"]
-                    },
-                    "issueDate": {
-                        "type": ["null", "string"]
-                    },
-                    "tourDate": {
-                        "type": ["null", "string"]
-                    },
-                    "visitsAllowed": {
-                        "type": ["null", "string"]
-                    },
-                    "visitsUsed": {
-                        "type": ["null", "string"]
-                    }
-                },
-                "type": ["null", "object"]
-            },
-            "club_id": {
-                "type": ["null", "string"]
-            }
-        }
-    }
+    schema = StreamSchema()
 
 
 class ClubsStream(ABCStream):
@@ -499,88 +263,7 @@ class ClubsStream(ABCStream):
         selected_by_default=False
     )
 
-    schema = {
-        "properties": {
-            "name": {
-                "type": ["null", "string"]
-            },
-            "shortName": {
-                "type": ["null", "string"]
-            },
-            "timeZone": {
-                "type": ["null", "string"]
-            },
-            "address1": {
-                "type": ["null", "string"]
-            },
-            "city": {
-                "type": ["null", "string"]
-            },
-            "state": {
-                "type": ["null", "string"]
-            },
-            "postalCode": {
-                "type": ["null", "string"]
-            },
-            "country": {
-                "type": ["null", "string"]
-            },
-            "email": {
-                "type": ["null", "string"]
-            },
-            "onlineSignupAllowedPaymentMethods": {
-                "type": ["null", "string"]
-            },
-            "supportedCountries": {
-                "type": ["null", "array"]
-            },
-            "online": {
-                "properties": {
-                    "minors": {
-                        "properties": {
-                            "allowMinors": {
-                                "type": ["null", "string"]
-                            },
-                            "minorAge": {
-                                "type": ["null", "string"]
-                            },
-                            "minorDisclaimer": {
-                                "type": ["null", "string"]
-                            }
-                        },
-                        "type": ["null", "object"]
-                    },
-                    "ccNames": {
-                        "properties": {
-                            "requireCCNameMatch": {
-                                "type": ["null", "string"]
-                            },
-                            "differentCcNamesDisclaimer": {
-                                "type": ["null", "string"]
-                            }
-                        },
-                        "type": ["null", "object"]
-                    },
-                    "showFees": {
-                        "type": ["null", "string"]
-                    }
-                },
-                "type": ["null", "object"]
-            },
-            "billingCountry": {
-                "type": ["null", "string"]
-            },
-            "creditCardPaymentMethods": {
-                "type": ["null", "array"]
-            },
-            "thirdPartyPaymentMethods": {
-                "type": ["null", "array"]
-            },
-            "club_id": {
-                "type": ["null", "string"]
-            }
-        }
-    }
+    schema = StreamSchema()
 
 
 class CheckInStream(ABCStream):
@@ -596,33 +279,7 @@ class CheckInStream(ABCStream):
         selected_by_default=False
     )
 
-    schema = {
-        "properties": {
-            "checkInId": {
-                "type": ["null", "string"]
-            },
-            "checkInTimestamp": {
-                "type": ["null", "string"]
-            },
-            "stationName": {
-                "type": ["null", "string"]
-            },
-            "member": {
-                "properties": {
-                    "memberId": {
-                        "type": ["null", "string"]
-                    },
-                    "homeClub": {
-                        "type": ["null", "string"]
-                    }
-                },
-                "type": ["null", "object"]
-            },
-            "club_id": {
-                "type": ["null", "string"]
-            }
-        }
-    }
+    schema = StreamSchema()
 
 
 class EventsStream(ABCStream):
@@ -638,87 +295,4 @@ class EventsStream(ABCStream):
         selected_by_default=False
     )
 
-    schema = {
-        "properties": {
-            "eventId": {
-                "type": ["null", "string"]
-            },
-            "eventTypeId": {
-                "type": ["null", "string"]
-            },
-            "eventName": {
-                "type": ["null", "string"]
-            },
-            "category": {
-                "type": ["null", "string"]
-            },
-            "isAvailableOnline": {
-                "type": ["null", "string"]
-            },
-            "eventTimestamp": {
-                "type": ["null", "string"],
-                "format": "date-time"},
-            "status": {
-                "type": ["null", "string"]
-            },
-            "duration": {
-                "type": ["null", "string"]
-            },
-            "allowCancelBefore": {
-                        "type": ["null", "string"],
-                        "format": "date-time"},
-            "startBookingTime": {
-                        "type": ["null", "string"],
-                        "format": "date-time"},
-            "stopBookingTime": {
-                        "type": ["null", "string"],
-                        "format": "date-time"},
-            "maxAttendees": {
-                "type": ["null", "string"] 
-            },
-            "comments": {
-                "type": ["null", "string"]
-            },
-            "employeeId": {
-                "type": ["null", "string"]
-            },
-            "employeeName": {
-                "type": ["null", "string"]
-            },
-            "createdTimestamp":  {
-                "type": ["null", "string"],
-                "format": "date-time"},
-            "modifiedTimestamp":  {
-                "type": ["null", "string"],
-                "format": "date-time"},
-            "locationId": {
-                "type": ["null", "string"]
-            },
-            "locationName": {
-                "type": ["null", "string"]
-            },
-            "earningsCode": {
-                "type": ["null", "string"]
-            },
-            "enrollAfterStartMinutes": {
-                "type": ["null", "string"]
-            },
-            "eventTrainingLevel": {
-                "properties": {
-                    "levelId": {
-                        "type": ["null", "string"]
-                    },
-                    "levelName": {
-                        "type": ["null", "string"]
-                    },
-                    "isFree": {
-                        "type": ["null", "string"]
-                    }
-                },
-                "type": ["null", "object"]
-            },
-            "members": {
-                "type": ["null", "array"] 
-            }
-        }
-    }
+    schema = StreamSchema()
@@ -0,0 +1,95 @@
+import singer
+from singer import metadata
+
+
+def compile_transform(schema, mdata):
+    """
+    Returns a function that transforms one record with `singer.Transformer`.
+    Fields deselected below the top level are pruned from the record first,
+    which singer does not do, so that their subtrees are never walked.
+    Args:
+        schema (dict): the stream's catalog schema
+        mdata (dict): the stream's catalog metadata, as a breadcrumb map
+    Returns:
+        function taking a record and returning the transformed record
+    """
+    excluded = excluded_tree(mdata)
+    transformer = singer.Transformer()
+
+    def transform(record):
+        if excluded:
+            _prune(record, excluded)
+        return transformer.transform(record, schema, mdata)
+
+    return transform
+
+
+def excluded_paths(mdata):
+    """
+    Args:
+        mdata (dict): catalog metadata, as a breadcrumb map
+    Returns:
+        set of paths (tuples of keys) to the fields the catalog leaves out,
+        relative to a record; elements of arrays are reached through 'item'
+    """
+    paths = set()
+    for breadcrumb, field_metadata in mdata.items():
+        if not breadcrumb or breadcrumb[0] not in ('properties', 'items'):
+            continue
+        if field_metadata.get('inclusion') == 'automatic':
+            continue
+        if field_metadata.get('selected') is False or \
+                field_metadata.get('inclusion') == 'unsupported':
+            paths.add(_breadcrumb_path(breadcrumb))
+    return paths
+
+
+def _breadcrumb_path(breadcrumb):
+    path = []
+    crumbs = iter(breadcrumb)
+    for crumb in crumbs:
+        if crumb == 'properties':
+            path.append(next(crumbs))
+        elif crumb == 'items':
+            path.append('item')
+    return tuple(path)
+
+
+def excluded_tree(mdata):
+    """
+    Returns:
+        `excluded_paths` as nested dicts; a key mapped to None is left out
+        along with everything beneath it
+    """
+    tree = {}
+    # shortest first, so a deselected parent swallows its children
+    for path in sorted(excluded_paths(mdata), key=len):
+        node = tree
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+            if node is None:
+                break
+        else:
+            node[path[-1]] = None
+    return tree
+
+
+def _prune(data, excluded):
+    if isinstance(data, dict):
+        for key, child in excluded.items():
+            if child is None:
+                data.pop(key, None)
+            elif key in data:
+                _prune(data[key], child)
+    elif isinstance(data, list) and excluded.get('item'):
+        for row in data:
+            _prune(row, excluded['item'])
+
+
+def stream_transform(catalog_entry):
+    """
+    Returns:
+        the transform for a catalog entry's schema and metadata
+    """
+    return compile_transform(catalog_entry.schema.to_dict(),
+                             metadata.to_map(catalog_entry.metadata))
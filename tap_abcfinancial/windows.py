@@ -0,0 +1,97 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import pendulum
+
+# streams the API only serves in 30 day windows
+THIRTY_DAY_STREAMS = {'checkins', 'events'}
+
+# for checkins, API does not appear to return any records < 7 hours old; 30 day
+# streams stop this long before the present, so we're not requesting records
+# that are not yet available
+AVAILABILITY_DELAY = timedelta(hours=12)
+
+
+class RunClock:
+    """
+    The time a run started, read once, so that every window, cutoff and
+    bookmark of the run ends at the same moment however long the run takes.
+    Times are plain datetimes: pendulum's arithmetic and formatting cost more
+    than the rest of the window bookkeeping put together.
+    """
+
+    def __init__(self, now=None):
+        """
+        Args:
+            now (datetime): defaults to the current time
+        """
+        self.now = to_datetime(now or pendulum.now('UTC'))
+        self.available_until = self.now - AVAILABILITY_DELAY
+        # 30 day streams keep moving to the next window until they reach this point
+        self.window_cutoff = self.available_until.replace(hour=0, minute=0, second=0,
+                                                          microsecond=0)
+
+    def sync_end(self, stream_name):
+        """
+        Returns:
+            datetime the last window of a club's sync of the stream ends at
+        """
+        if stream_name in THIRTY_DAY_STREAMS:
+            return self.available_until
+        return self.now
+
+
+class Window(namedtuple('Window', ['lower', 'upper'])):
+    """
+    Date range of one request, as datetimes; only formatted as the API expects
+    once it is sent
+    """
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, date_range):
+        """
+        Args:
+            date_range (str): a range as sent to the API, 'lower,upper'
+        """
+        lower, upper = date_range.split(',')
+        return cls(parse_datetime(lower), parse_datetime(upper))
+
+    def to_param(self):
+        return '{},{}'.format(format_api_datetime(self.lower),
+                              format_api_datetime(self.upper))
+
+
+def parse_datetime(value):
+    """
+    Returns:
+        timezone aware datetime of a datetime string, in UTC unless the string
+        says otherwise
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return to_datetime(pendulum.parse(value))
+
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def to_datetime(moment):
+    """
+    Returns:
+        a plain datetime of a pendulum (or any other) datetime
+    """
+    return datetime(moment.year, moment.month, moment.day, moment.hour,
+                    moment.minute, moment.second, moment.microsecond,
+                    tzinfo=timezone(moment.utcoffset()))
+
+
+def format_api_datetime(moment):
+    """
+    Returns:
+        datetime string in the following format: 'YYYY-MM-DD hh:mm:ss.nnnnnn'
+        (necessary format for ABC Financial API)
+    """
+    return '{:%Y-%m-%d %H:%M:%S}.000000'.format(moment)
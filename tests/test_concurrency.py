@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import pytest
+
+from tap_abcfinancial.concurrency import imap_interleaved, aimap_interleaved, ITEM_DONE
+
+
+def test_items_are_not_held_up_by_the_items_before_them():
+    # item 'a' only finishes once 'b' has been consumed, which `imap_ordered`
+    # would never get to
+    b_consumed = threading.Event()
+
+    def producer(item):
+        if item == 'a':
+            yield 'a1'
+            assert b_consumed.wait(5)
+            yield 'a2'
+        else:
+            yield 'b1'
+            yield 'b2'
+
+    results = []
+    for item, result in imap_interleaved(producer, ['a', 'b'], max_workers=2,
+                                         buffer_size=2):
+        results.append((item, result))
+        if (item, result) == ('b', ITEM_DONE):
+            b_consumed.set()
+
+    assert [result for item, result in results if item == 'a'] == ['a1', 'a2', ITEM_DONE]
+    assert [result for item, result in results if item == 'b'] == ['b1', 'b2', ITEM_DONE]
+    assert results.index(('b', ITEM_DONE)) < results.index(('a', 'a2'))
+
+
+def test_every_item_is_produced_in_order():
+    def producer(item):
+        return range(item * 10, item * 10 + 5)
+
+    results = list(imap_interleaved(producer, range(6), max_workers=3, buffer_size=1))
+
+    for item in range(6):
+        produced = [result for i, result in results if i == item]
+        assert produced == list(range(item * 10, item * 10 + 5)) + [ITEM_DONE]
+
+
+def test_failures_are_raised_on_the_consuming_thread():
+    def producer(item):
+        yield item
+        if item == 2:
+            raise ValueError('club 2 failed')
+
+    with pytest.raises(ValueError, match='club 2 failed'):
+        list(imap_interleaved(producer, range(4), max_workers=2))
+
+
+def test_async_items_are_not_held_up_by_the_items_before_them():
+    async def producer(item):
+        for index in range(3 if item == 'a' else 1):
+            await asyncio.sleep(0.01 if item == 'a' else 0)
+            yield '{}{}'.format(item, index)
+
+    async def consume():
+        return [result async for result in
+                aimap_interleaved(producer, ['a', 'b'], max_tasks=2, buffer_size=1)]
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(consume())
+    finally:
+        loop.close()
+
+    assert [result for item, result in results if item == 'a'] == ['a0', 'a1', 'a2', ITEM_DONE]
+    assert results.index(('b', ITEM_DONE)) < results.index(('a', 'a0'))
@@ -0,0 +1,54 @@
+from tap_abcfinancial.dedup import RecordDedup
+
+
+def event(event_id, modified='2021-03-01T12:00:00Z'):
+    return {'eventId': event_id, 'modifiedTimestamp': modified}
+
+
+def test_records_sharing_a_timestamp_are_kept_apart_by_key():
+    dedup = RecordDedup('events', ['eventId'], 1000)
+    events = [event('e{}'.format(i)) for i in range(5)]
+
+    assert list(dedup.filter('1234', events)) == events
+    assert dedup.dropped['1234'] == 0
+
+
+def test_repeated_records_are_dropped():
+    dedup = RecordDedup('events', ['eventId'], 1000)
+    events = [event('e{}'.format(i)) for i in range(5)]
+
+    list(dedup.filter('1234', events))
+    assert list(dedup.filter('1234', events + [event('e0', '2021-03-02T00:00:00Z')])) == \
+        [event('e0', '2021-03-02T00:00:00Z')]
+    assert dedup.dropped['1234'] == 5
+
+
+def test_records_missing_a_key_property_are_never_dropped():
+    # keyed on a field the records lack, every record of a club sharing a
+    # timestamp would hash to the same digest
+    dedup = RecordDedup('checkins', ['id'], 1000)
+    checkins = [{'checkInId': 'c{}'.format(i), 'checkInTimestamp': '2021-03-01T12:00:00Z'}
+                for i in range(5)]
+
+    assert list(dedup.filter('1234', checkins)) == checkins
+    assert list(dedup.filter('1234', checkins)) == checkins
+    assert dedup.dropped['1234'] == 0
+
+
+def test_events_are_told_apart_by_event_id():
+    # `events` declare `id` as their key property, which event records lack
+    dedup = RecordDedup('events', ['id'], 1000)
+    events = [event('e{}'.format(i)) for i in range(5)]
+
+    assert list(dedup.filter('1234', events)) == events
+    assert list(dedup.filter('1234', events)) == []
+    assert dedup.dropped['1234'] == 5
+
+
+def test_boundary_seeds_the_next_run():
+    first = RecordDedup('events', ['eventId'], 1000)
+    list(first.filter('1234', [event('e0', '2021-03-01T00:00:00Z'), event('e1'), event('e2')]))
+
+    second = RecordDedup('events', ['eventId'], 1000)
+    second.seed(first.boundary('1234'))
+    assert list(second.filter('1234', [event('e1'), event('e2'), event('e3')])) == [event('e3')]
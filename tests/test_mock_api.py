@@ -0,0 +1,54 @@
+import pytest
+
+from mock_api import Dataset
+from mock_api.generator import STREAMS
+from tap_abcfinancial.dedup import KEY_PROPERTIES
+
+
+def undefined_paths(value, schema, path=()):
+    """
+    Returns:
+        generator of the paths of `value` its schema does not define
+    """
+    if isinstance(value, dict):
+        properties = schema.get('properties', {})
+        for key, child in value.items():
+            if key not in properties:
+                yield path + (key,)
+            else:
+                yield from undefined_paths(child, properties[key], path + (key,))
+    elif isinstance(value, list):
+        for child in value:
+            yield from undefined_paths(child, schema.get('items', {}), path)
+
+
+@pytest.mark.parametrize('stream', sorted(STREAMS))
+def test_records_only_have_fields_of_the_schema(stream):
+    dataset = Dataset(records_per_club=20, start='2020-01-01T00:00:00+00:00')
+    schema = STREAMS[stream].schema
+    for record in dataset.select(stream, '1234'):
+        assert list(undefined_paths(record, schema)) == []
+
+
+@pytest.mark.parametrize('stream', sorted(STREAMS))
+def test_records_have_their_key_properties(stream):
+    dataset = Dataset(records_per_club=20, start='2020-01-01T00:00:00+00:00')
+    # the fields the tap tells records apart by, `eventId` for events
+    key_properties = KEY_PROPERTIES.get(stream, STREAMS[stream].meta_fields['key_properties'])
+    records = dataset.select(stream, '1234')
+    if stream == 'clubs':
+        pytest.skip('the clubs schema has no id field')
+    keys = {tuple(record.get(key) for key in key_properties) for record in records}
+    assert None not in {value for key in keys for value in key}
+    assert len(keys) == len(records)
+
+
+def test_date_ranges_include_both_bounds():
+    dataset = Dataset(records_per_club=100, start='2020-01-01T00:00:00+00:00',
+                      end='2020-01-01T01:40:00+00:00')
+    # one record a minute; records 10 to 20 are stamped exactly on the bounds
+    lower, upper = dataset.timestamp('checkins', 10), dataset.timestamp('checkins', 20)
+
+    assert dataset.count('checkins', '1234', lower, upper) == 11
+    assert [record['checkInId'] for record in dataset.select('checkins', '1234', lower, upper)] == \
+        ['1234-{}'.format(i) for i in range(10, 21)]
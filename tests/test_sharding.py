@@ -0,0 +1,50 @@
+from tap_abcfinancial.sharding import merge_states, shard_club_ids
+from tap_abcfinancial.state import compact_state
+
+CLUB_IDS = [str(club_id) for club_id in range(1000, 1100)]
+
+
+def test_every_club_belongs_to_exactly_one_shard():
+    shards = [shard_club_ids(CLUB_IDS, index, 4) for index in range(4)]
+
+    assert sorted(club_id for shard in shards for club_id in shard) == CLUB_IDS
+    assert shard_club_ids(list(reversed(CLUB_IDS)), 1, 4) == list(reversed(shards[1]))
+
+
+def test_merge_keeps_the_latest_bookmark_across_layouts():
+    nested = {'currently_syncing': None, 'bookmarks': {'members': {
+        '1000': {'last_updated': '2021-03-01T00:00:00+00:00'},
+        '1001': {'last_updated': '2021-01-01T00:00:00+00:00', 'density': 3.0},
+    }}}
+    compact = compact_state({'bookmarks': {'members': {
+        '1001': {'last_updated': '2021-02-01T00:00:00Z', 'density': 5.0},
+        '1002': {'last_updated': '2021-02-01T00:00:00+00:00'},
+    }, 'checkins': {
+        '1001': {'last_updated': '2021-02-01T00:00:00+00:00'},
+    }}})
+    compressed = compact_state({'bookmarks': {'members': {
+        '1000': {'last_updated': '2021-02-15T00:00:00+00:00'},
+        '1002': {'last_updated': '2021-03-01T00:00:00+00:00'},
+    }}}, compress=True)
+
+    merged = merge_states([nested, compact, compressed])
+
+    assert merged == {'currently_syncing': None, 'bookmarks': {
+        'members': {
+            '1000': {'last_updated': '2021-03-01T00:00:00+00:00'},
+            '1001': {'last_updated': '2021-02-01T00:00:00Z', 'density': 5.0},
+            '1002': {'last_updated': '2021-03-01T00:00:00+00:00'},
+        },
+        'checkins': {
+            '1001': {'last_updated': '2021-02-01T00:00:00+00:00'},
+        },
+    }}
+
+
+def test_merge_leaves_its_inputs_alone():
+    compact = compact_state({'bookmarks': {'members': {
+        '1000': {'last_updated': '2021-02-01T00:00:00+00:00'}}}})
+    copied = dict(compact)
+
+    merge_states([compact])
+    assert compact == copied
@@ -0,0 +1,97 @@
+import copy
+
+import pytest
+
+from tap_abcfinancial.state import StateWriter, compact_state, expand_state, COMPACT_KEY
+
+STATE = {
+    'currently_syncing': 'members',
+    'bookmarks': {
+        'members': {
+            '1000': {'last_updated': '2021-03-01T00:00:00+00:00', 'density': 12.5},
+            '1001': {'last_updated': '2021-03-01T00:00:00+00:00', 'density': 1},
+            '1002': {'last_updated': '2021-02-01T00:00:00+00:00',
+                     'in_flight': {'range': '2021-02-01 00:00:00.000000,'
+                                            '2021-03-01 00:00:00.000000', 'page': 2}},
+        },
+        'checkins': {
+            '1000': {'last_updated': '2021-03-01T00:00:00+00:00', 'dedup': ['a1', 'b2']},
+            '1001': {'last_updated': '2021-03-01T00:00:00+00:00', 'dedup': ['a1', 'b2']},
+            '1002': {'last_updated': True},
+        },
+    },
+}
+
+
+def expanded(state):
+    state = copy.deepcopy(state)
+    expand_state(state)
+    return state
+
+
+@pytest.mark.parametrize('compress', [False, True], ids=['compact', 'compressed'])
+def test_compact_states_expand_to_the_same_state(compress):
+    compacted = compact_state(STATE, compress=compress)
+
+    assert 'bookmarks' not in compacted and COMPACT_KEY in compacted
+    assert expanded(compacted) == STATE
+
+
+def test_clubs_sharing_a_value_do_not_share_an_object():
+    state = expanded(compact_state(STATE))
+    checkins = state['bookmarks']['checkins']
+
+    checkins['1000']['dedup'].append('c3')
+    assert checkins['1001']['dedup'] == ['a1', 'b2']
+
+
+def test_nested_states_expand_to_themselves():
+    state = copy.deepcopy(STATE)
+
+    assert expand_state(state) is False
+    assert state == STATE
+
+
+def test_compact_bookmarks_win_over_nested_ones():
+    state = compact_state(STATE)
+    state['bookmarks'] = {'members': {'1000': {'last_updated': '2020-01-01T00:00:00+00:00'},
+                                      '1003': {'last_updated': '2020-01-01T00:00:00+00:00'}}}
+    state = expanded(state)
+
+    assert state['bookmarks']['members']['1000'] == STATE['bookmarks']['members']['1000']
+    assert state['bookmarks']['members']['1003'] == {'last_updated': '2020-01-01T00:00:00+00:00'}
+
+
+def test_writer_regroups_the_streams_changed_since_the_last_state():
+    state = copy.deepcopy(STATE)
+    writer = StateWriter(state, flush_interval=3600, state_format='compact')
+    assert expanded(writer.encode()) == STATE
+
+    # changed without telling the writer, so the last grouping is reused
+    state['bookmarks']['checkins']['1002'] = {'last_updated': '2021-04-01T00:00:00+00:00'}
+    state['bookmarks']['members']['1002'] = {'last_updated': '2021-04-01T00:00:00+00:00'}
+    writer.changed('members')
+    encoded = expanded(writer.encode())
+    assert encoded['bookmarks']['members'] == state['bookmarks']['members']
+    assert encoded['bookmarks']['checkins'] == STATE['bookmarks']['checkins']
+
+    writer.changed('checkins')
+    assert expanded(writer.encode()) == state
+
+
+def test_writer_regroups_every_stream_on_an_unnamed_change():
+    state = copy.deepcopy(STATE)
+    writer = StateWriter(state, flush_interval=3600, state_format='compressed')
+    writer.encode()
+
+    state['bookmarks']['members'].pop('1000')
+    state['bookmarks']['checkins']['1000']['dedup'] = []
+    state['bookmarks']['events'] = {'1000': {'last_updated': '2021-03-01T00:00:00+00:00'}}
+    writer.changed()
+    assert expanded(writer.encode()) == state
+
+
+def test_nested_writer_writes_the_state_itself():
+    writer = StateWriter(STATE, flush_interval=3600)
+
+    assert writer.encode() is STATE
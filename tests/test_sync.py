@@ -0,0 +1,101 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.run import discover, select_streams
+from mock_api import Dataset, MockServer
+
+TAP = 'from tap_abcfinancial import main; main()'
+CLUB_IDS = ['1000', '1001', '1002']
+
+# more than a page of 5000, so each club takes pages 1 and 2 full and page 3 short
+RECORDS_PER_CLUB = 12000
+
+
+def sync(tmp_path, streams, state=None, **config):
+    """
+    Returns:
+        array of the messages of a sync of `streams` against the mock API,
+        starting from `state`
+    """
+    dataset = Dataset(records_per_club=RECORDS_PER_CLUB, start='2020-01-01T00:00:00+00:00')
+    with MockServer(dataset) as server:
+        config_path = tmp_path / 'config.json'
+        config_path.write_text(json.dumps(dict({
+            'start_date': '2020-01-01T00:00:00Z',
+            'api_key': 'test',
+            'app_id': 'test',
+            'club_ids': CLUB_IDS,
+            'api_url': server.url,
+        }, **config)))
+
+        catalog_path = tmp_path / 'catalog.json'
+        catalog_path.write_text(json.dumps(select_streams(discover(str(config_path)), streams)))
+
+        args = [sys.executable, '-c', TAP, '-c', str(config_path), '-p', str(catalog_path)]
+        if state is not None:
+            state_path = tmp_path / 'state.json'
+            state_path.write_text(json.dumps(state))
+            args += ['-s', str(state_path)]
+
+        output = subprocess.run(
+            args,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        ).stdout
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def record_ids(messages, stream, key):
+    """
+    Returns:
+        dict club_id -> array of the ids of the club's records, in the order written
+    """
+    ids = {}
+    for message in messages:
+        if message['type'] == 'RECORD' and message['stream'] == stream:
+            record_id = message['record'][key]
+            ids.setdefault(record_id.split('-')[0], []).append(record_id)
+    return ids
+
+
+@pytest.fixture(scope='module')
+def members_sync(tmp_path_factory):
+    return sync(tmp_path_factory.mktemp('members'), ['members'])
+
+
+def test_every_record_is_written_once(members_sync):
+    ids = record_ids(members_sync, 'members', 'memberId')
+
+    assert sorted(ids) == CLUB_IDS
+    for club_id in CLUB_IDS:
+        assert ids[club_id] == ['{}-{}'.format(club_id, i) for i in range(RECORDS_PER_CLUB)]
+
+
+def test_resume_from_a_page_checkpoint(tmp_path):
+    messages = sync(tmp_path, ['members'], state_flush_interval=0)
+    # the first state written mid-club, once page 1 of club 1000 is written
+    state = next(message['value'] for message in messages
+                 if message['type'] == 'STATE'
+                 and message['value']['bookmarks']['members']['1000'].get('in_flight'))
+    assert state['bookmarks']['members']['1000']['in_flight']['page'] == 1
+    written = record_ids(messages[:messages.index({'type': 'STATE', 'value': state})],
+                         'members', 'memberId')
+    assert sorted(written) == ['1000'] and len(written['1000']) == 5000
+
+    resumed = record_ids(sync(tmp_path, ['members'], state=state), 'members', 'memberId')
+
+    assert resumed['1000'] == ['1000-{}'.format(i) for i in range(5000, RECORDS_PER_CLUB)]
+    assert not set(written['1000']) & set(resumed['1000'])
+    for club_id in CLUB_IDS[1:]:
+        assert len(resumed[club_id]) == RECORDS_PER_CLUB
+
+
+def test_state_messages_are_never_repeated(members_sync):
+    states = [message['value'] for message in members_sync if message['type'] == 'STATE']
+
+    assert all(previous != state for previous, state in zip(states, states[1:]))
+    assert sorted(states[-1]['bookmarks']['members']) == CLUB_IDS
+    assert all('in_flight' not in bookmark
+               for bookmark in states[-1]['bookmarks']['members'].values())
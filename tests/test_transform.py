@@ -0,0 +1,123 @@
+import copy
+import random
+
+import pytest
+import singer
+from singer.transform import SchemaMismatch
+
+from tap_abcfinancial.streams import (MembersStream, ProspectsStream, ClubsStream,
+                                      CheckInStream, EventsStream)
+from tap_abcfinancial.transform import compile_transform
+
+STREAMS = [MembersStream, ProspectsStream, ClubsStream, CheckInStream, EventsStream]
+
+VALUES = [None, '', 'abc', '1,234', 5, 2.5, True, 'false', '2020-01-02 03:04:05',
+          '2020-01-02T03:04:05Z', 'not a date', [], [1, 'a'], {}, {'x': 1}]
+
+
+def random_record(schema, rng):
+    """
+    Returns:
+        a value shaped like `schema` at random, with some fields missing, some
+        of the wrong type and some the schema does not have
+    """
+    if rng.random() < 0.1 or 'properties' not in schema:
+        return rng.choice(VALUES)
+
+    record = {key: random_record(subschema, rng)
+              for key, subschema in schema['properties'].items() if rng.random() < 0.8}
+    if rng.random() < 0.2:
+        record['extra'] = 1
+    return record
+
+
+def random_metadata(schema, rng):
+    mdata = {(): {'selected': True}}
+    for key in schema['properties']:
+        roll = rng.random()
+        if roll < 0.2:
+            mdata[('properties', key)] = {'selected': False}
+        elif roll < 0.25:
+            mdata[('properties', key)] = {'inclusion': 'unsupported'}
+        elif roll < 0.3:
+            mdata[('properties', key)] = {'inclusion': 'automatic', 'selected': False}
+        else:
+            mdata[('properties', key)] = {}
+    return mdata
+
+
+def rooted(schema):
+    """
+    Returns:
+        a copy of `schema` with a root `object` type, so that singer coerces
+        and formats its fields instead of passing records through
+    """
+    schema = copy.deepcopy(schema)
+    schema['type'] = 'object'
+    for subschema in schema['properties'].values():
+        # singer cannot transform arrays without `items`
+        if 'array' in subschema.get('type', []):
+            subschema.setdefault('items', {})
+    return schema
+
+
+def singer_transform(record, schema, mdata):
+    try:
+        with singer.Transformer() as transformer:
+            return 'ok', transformer.transform(copy.deepcopy(record), schema, mdata)
+    except SchemaMismatch:
+        return 'mismatch', None
+
+
+def stream_transform(record, schema, mdata):
+    try:
+        return 'ok', compile_transform(schema, mdata)(copy.deepcopy(record))
+    except SchemaMismatch:
+        return 'mismatch', None
+
+
+@pytest.mark.parametrize('stream', STREAMS, ids=lambda stream: stream.stream)
+@pytest.mark.parametrize('root_type', [False, True], ids=['packaged', 'object_root'])
+def test_transform_matches_singer(stream, root_type):
+    rng = random.Random(stream.stream)
+    schema = rooted(stream.schema) if root_type else copy.deepcopy(stream.schema)
+    for _ in range(200):
+        mdata = random_metadata(schema, rng)
+        record = random_record(schema, rng)
+        assert stream_transform(record, schema, mdata) == \
+            singer_transform(record, schema, mdata)
+
+
+@pytest.mark.parametrize('stream', STREAMS, ids=lambda stream: stream.stream)
+def test_packaged_schemas_pass_records_through(stream):
+    # none of the packaged schemas has a root `type`, so singer coerces and
+    # formats nothing; adding one changes the tap's output
+    rng = random.Random(stream.stream)
+    schema = copy.deepcopy(stream.schema)
+    mdata = {(): {'selected': True}}
+    for _ in range(50):
+        record = random_record(schema, rng)
+        if isinstance(record, dict):
+            assert compile_transform(schema, mdata)(copy.deepcopy(record)) == record
+
+
+def test_fields_deselected_below_the_top_level_are_dropped():
+    schema = {'type': 'object', 'properties': {
+        'id': {'type': ['string', 'null']},
+        'agreement': {'type': ['object', 'null'], 'properties': {
+            'salesPersonId': {'type': ['string', 'null']},
+            'term': {'type': ['integer', 'null']},
+        }},
+        'notes': {'type': ['array', 'null'], 'items': {'type': 'object', 'properties': {
+            'text': {'type': ['string', 'null']},
+            'author': {'type': ['string', 'null']},
+        }}},
+    }}
+    mdata = {(): {'selected': True},
+             ('properties', 'agreement', 'properties', 'salesPersonId'): {'selected': False},
+             ('properties', 'notes', 'items', 'properties', 'author'): {'selected': False}}
+    record = {'id': 'm1', 'agreement': {'salesPersonId': 's1', 'term': '12'},
+              'notes': [{'text': 'a', 'author': 'x'}, {'text': 'b'}]}
+
+    assert compile_transform(schema, mdata)(record) == \
+        {'id': 'm1', 'agreement': {'term': 12}, 'notes': [{'text': 'a'}, {'text': 'b'}]}